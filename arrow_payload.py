@@ -0,0 +1,66 @@
+"""
+Binary transport of the API payload: every table as a compressed Arrow IPC stream, all of them in one
+multipart/form-data body (one part per table, named after it, of type application/vnd.apache.arrow.stream).
+
+The tables follow the value rules of the JSON body (prepare_df_for_json): NaN and +/-inf are null, object columns
+are sent as text with the null tokens ('nan', 'None', ...) as null. Integer, float, boolean and categorical
+(dictionary) columns keep their type, so the API takes the buffers as they are instead of parsing text.
+The pandas metadata is left out (the index is not sent, as in JSON), and the buffers of tables shorter than
+IPC_COMPRESSION_MIN_ROWS are not compressed: for a handful of rows the schema dominates and compression only
+adds framing. read_arrow_part is the reader for the API side.
+"""
+
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from json_encoder import NULL_TOKENS
+
+# --- Configuration ---
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+IPC_COMPRESSION = os.environ.get("API_IPC_COMPRESSION", "zstd") # buffer compression of the streams: 'zstd', 'lz4' or 'none'
+IPC_COMPRESSION_MIN_ROWS = 100
+
+
+def payload_table(df: pd.DataFrame) -> pa.Table:
+    """Arrow table of one payload DataFrame (index dropped), with the nulls of its JSON encoding."""
+    object_columns = df.select_dtypes(include=['object']).columns
+    if not object_columns.empty:
+        df = df.copy()
+        for col in object_columns:
+            try:
+                text = df[col].astype(str)
+                df[col] = text.where(~text.isin(NULL_TOKENS), None)
+            except Exception: pass
+    # A categorical column with no categories (all null) has no value type Arrow can infer: it is text, as the others
+    empty_categoricals = [col for col in df.select_dtypes(include=['category']).columns
+                          if df[col].cat.categories.empty and df[col].cat.categories.dtype == object]
+    table = pa.Table.from_pandas(df, preserve_index=False) # NaN of float columns is already null here
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type):
+            column = table.column(i)
+            table = table.set_column(i, field, pc.if_else(pc.is_finite(column), column, pa.scalar(None, field.type)))
+        elif field.name in empty_categoricals:
+            table = table.set_column(i, field.name, table.column(i).cast(pa.dictionary(field.type.index_type, pa.string())))
+    return table.replace_schema_metadata(None)
+
+
+def encode_ipc_stream(table: pa.Table, compression: str = IPC_COMPRESSION) -> bytes:
+    """One table as an Arrow IPC stream, its buffers compressed with compression when it is long enough."""
+    sink = pa.BufferOutputStream()
+    compressed = compression != 'none' and table.num_rows >= IPC_COMPRESSION_MIN_ROWS
+    options = pa.ipc.IpcWriteOptions(compression=compression if compressed else None)
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_arrow_parts(tables: dict, compression: str = IPC_COMPRESSION) -> dict:
+    """{payload name: IPC stream} of the tables, in their order."""
+    return {name: encode_ipc_stream(payload_table(df), compression) for name, df in tables.items()}
+
+
+def read_arrow_part(data: bytes) -> pd.DataFrame:
+    """API side: the DataFrame of one part (the compression is read from the stream itself)."""
+    return pa.ipc.open_stream(data).read_all().to_pandas()
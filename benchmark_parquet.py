@@ -0,0 +1,159 @@
+"""
+Compression and encoding benchmark for the Parquet outputs of preprocess_data.py.
+
+Every client-keyed table is rewritten, sorted by SK_ID_CURR, with each combination of codec, row group size and
+dictionary setting, then measured the way the dashboard uses it:
+- file size,
+- cold single-client lookup (file evicted from the page cache, fresh footer read),
+- warm single-client lookup (same read again, file and footer cached),
+- full scan of the table.
+The results are printed per table and saved to BENCHMARK_RESULTS_FILE so the settings can be picked per table.
+
+Usage: python benchmark_parquet.py [--tables bureau.parquet ...] [--codecs snappy zstd:3 ...] [--row-groups 2000 100000]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import time
+import traceback
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from preprocess_data import OUTPUT_PARQUET_DIR, PARTITION_KEYS, plain_columns
+
+# --- Configuration ---
+BENCHMARK_DIR = 'parquet_benchmark' # scratch folder for the rewritten variants
+BENCHMARK_RESULTS_FILE = 'parquet_benchmark_results.csv'
+# codec[:level]; 'none' writes uncompressed pages
+CODECS = ['none', 'snappy', 'lz4', 'zstd:1', 'zstd:3', 'zstd:9']
+ROW_GROUP_SIZES = [2000, 10000, 100000]
+DICTIONARY_SETTINGS = [True, False]
+LOOKUP_CLIENTS = 20 # clients looked up per variant, the median latency is reported
+RANDOM_SEED = 42
+
+TABLES = [filename.replace('.csv', '.parquet') for filename, key in PARTITION_KEYS.items() if key]
+
+
+def parse_codec(codec: str) -> tuple[str, int | None]:
+    """'zstd:3' -> ('zstd', 3), 'snappy' -> ('snappy', None)."""
+    name, _, level = codec.partition(':')
+    return name, int(level) if level else None
+
+
+def load_table(table_file: str) -> pa.Table:
+    """Reads a converted table in whatever layout it was written, sorted by SK_ID_CURR like the sorted layout."""
+    table = plain_columns(pq.read_table(os.path.join(OUTPUT_PARQUET_DIR, table_file)))
+    # The hive layout hands the partition column back as a dictionary of strings
+    table = table.set_column(table.schema.get_field_index('SK_ID_CURR'), 'SK_ID_CURR', table.column('SK_ID_CURR').cast(pa.int32()))
+    return table.sort_by('SK_ID_CURR')
+
+
+def evict_from_page_cache(path: str):
+    """Drops the file from the OS page cache so the next read comes from disk (Linux; a no-op elsewhere)."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def lookup_client(path: str, client_id: int) -> int:
+    """One single-client read as in get_data_for_client: open the file, prune row groups on statistics, filter."""
+    return pq.read_table(path, filters=[('SK_ID_CURR', '=', client_id)]).num_rows
+
+
+def benchmark_variant(table: pa.Table, path: str, codec: str, row_group_size: int, use_dictionary: bool,
+                      client_ids: np.ndarray) -> dict:
+    """Writes one variant of the table and measures its size, lookup latencies and full-scan time."""
+    compression, level = parse_codec(codec)
+    start = time.perf_counter()
+    pq.write_table(table, path, compression=compression, compression_level=level,
+                   row_group_size=row_group_size, use_dictionary=use_dictionary, write_statistics=True)
+    write_seconds = time.perf_counter() - start
+
+    cold, warm = [], []
+    for client_id in client_ids:
+        evict_from_page_cache(path)
+        start = time.perf_counter()
+        lookup_client(path, int(client_id))
+        cold.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        lookup_client(path, int(client_id))
+        warm.append(time.perf_counter() - start)
+
+    evict_from_page_cache(path)
+    start = time.perf_counter()
+    pq.read_table(path)
+    scan_seconds = time.perf_counter() - start
+
+    return {
+        'codec': codec,
+        'row_group_size': row_group_size,
+        'dictionary': use_dictionary,
+        'size_mb': os.path.getsize(path) / (1024 * 1024),
+        'write_s': write_seconds,
+        'cold_lookup_ms': statistics.median(cold) * 1000,
+        'warm_lookup_ms': statistics.median(warm) * 1000,
+        'full_scan_s': scan_seconds
+    }
+
+
+def run_benchmark(tables: list = TABLES, codecs: list = CODECS, row_group_sizes: list = ROW_GROUP_SIZES,
+                  dictionary_settings: list = DICTIONARY_SETTINGS, lookup_clients: int = LOOKUP_CLIENTS) -> pd.DataFrame:
+    """Runs the whole matrix on every table and returns one row of measurements per (table, variant)."""
+    if os.path.exists(BENCHMARK_DIR):
+        shutil.rmtree(BENCHMARK_DIR)
+    os.makedirs(BENCHMARK_DIR)
+    rng = np.random.default_rng(RANDOM_SEED)
+
+    results = []
+    for table_file in tables:
+        print(f"\n--- Benchmarking {table_file} ---")
+        try:
+            table = load_table(table_file)
+        except Exception as e:
+            print(f"  -> ERROR reading {table_file}: {e}")
+            traceback.print_exc()
+            continue
+        distinct_ids = np.unique(table.column('SK_ID_CURR').to_numpy())
+        client_ids = rng.choice(distinct_ids, size=min(lookup_clients, len(distinct_ids)), replace=False)
+        print(f"{table.num_rows} rows, {len(distinct_ids)} clients, {len(client_ids)} lookups per variant.")
+
+        for codec in codecs:
+            for row_group_size in row_group_sizes:
+                for use_dictionary in dictionary_settings:
+                    path = os.path.join(BENCHMARK_DIR, table_file)
+                    result = benchmark_variant(table, path, codec, row_group_size, use_dictionary, client_ids)
+                    result['table'] = table_file
+                    results.append(result)
+                    print(f"  {codec:<8} rg={row_group_size:<7} dict={str(use_dictionary):<5} "
+                          f"{result['size_mb']:>8.1f} MB  cold {result['cold_lookup_ms']:>7.1f} ms  "
+                          f"warm {result['warm_lookup_ms']:>7.1f} ms  scan {result['full_scan_s']:>6.2f} s")
+                    os.remove(path)
+
+    shutil.rmtree(BENCHMARK_DIR)
+    columns = ['table', 'codec', 'row_group_size', 'dictionary', 'size_mb', 'write_s', 'cold_lookup_ms', 'warm_lookup_ms', 'full_scan_s']
+    results_df = pd.DataFrame(results, columns=columns)
+    results_df.to_csv(BENCHMARK_RESULTS_FILE, index=False)
+    print(f"\nSaved {len(results_df)} measurements to {BENCHMARK_RESULTS_FILE}.")
+    return results_df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark Parquet codecs and encodings on the converted tables.")
+    parser.add_argument('--tables', nargs='+', default=TABLES, help="Tables to benchmark (Parquet names in the output folder).")
+    parser.add_argument('--codecs', nargs='+', default=CODECS, help="Codecs as name[:level], e.g. snappy zstd:3 none.")
+    parser.add_argument('--row-groups', nargs='+', type=int, default=ROW_GROUP_SIZES, help="Row group sizes in rows.")
+    parser.add_argument('--no-dictionary-matrix', action='store_true', help="Only benchmark with dictionary encoding on.")
+    parser.add_argument('--lookups', type=int, default=LOOKUP_CLIENTS, help="Clients looked up per variant.")
+    args = parser.parse_args()
+
+    run_benchmark(tables=args.tables, codecs=args.codecs, row_group_sizes=args.row_groups,
+                  dictionary_settings=[True] if args.no_dictionary_matrix else DICTIONARY_SETTINGS, lookup_clients=args.lookups)
@@ -1,74 +1,169 @@
+import argparse
 import pandas as pd
+import numpy as np
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 # --- Configuration ---
 SOURCE_DATA_DIR = 'data'
 SAMPLE_OUTPUT_DIR = 'data_sample' # We'll create a new folder for our smaller files
 SAMPLE_FRACTION = 0.10  # Use 10% of the clients
-
-# --- Create the sample ---
-print(f"--- Creating a {SAMPLE_FRACTION*100}% sample of the data ---")
-
-# 1. Read the main application file
-app_df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, 'application_test.csv'))
-
-# 2. Get a random sample of client IDs
-sampled_app_df = app_df.sample(frac=SAMPLE_FRACTION, random_state=42) # random_state for reproducibility
-sample_client_ids = set(sampled_app_df['SK_ID_CURR'])
-
-print(f"Sampled {len(sample_client_ids)} client IDs.")
-
-# 3. Create the new output directory
-if not os.path.exists(SAMPLE_OUTPUT_DIR):
-    os.makedirs(SAMPLE_OUTPUT_DIR)
-    print(f"Created output directory: {SAMPLE_OUTPUT_DIR}")
-
-# 4. Save the new, smaller application_test.csv
-sampled_app_df.to_csv(os.path.join(SAMPLE_OUTPUT_DIR, 'application_test.csv'), index=False)
-print("Saved sampled application_test.csv.")
-
-# 5. Now, filter all other large CSVs based on these sampled IDs
-files_to_filter = [
-    'bureau.csv', 'previous_application.csv', 'POS_CASH_balance.csv',
-    'installments_payments.csv', 'credit_card_balance.csv'
-]
-
-# Get all related SK_ID_BUREAU and SK_ID_PREV from the sampled clients
-bureau_df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, 'bureau.csv'))
-prev_app_df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, 'previous_application.csv'))
-
-related_bureau_df = bureau_df[bureau_df['SK_ID_CURR'].isin(sample_client_ids)]
-sample_bureau_ids = set(related_bureau_df['SK_ID_BUREAU'])
-related_prev_app_df = prev_app_df[prev_app_df['SK_ID_CURR'].isin(sample_client_ids)]
-sample_prev_ids = set(related_prev_app_df['SK_ID_PREV'])
-
-# Save the sampled bureau.csv
-related_bureau_df.to_csv(os.path.join(SAMPLE_OUTPUT_DIR, 'bureau.csv'), index=False)
-print("Saved sampled bureau.csv.")
-
-# Save the sampled previous_application.csv
-related_prev_app_df.to_csv(os.path.join(SAMPLE_OUTPUT_DIR, 'previous_application.csv'), index=False)
-print("Saved sampled previous_application.csv.")
-
-
-# Filter and save the remaining files
-for filename in files_to_filter[2:]: # We've already handled bureau and previous_app
+CHUNK_SIZE = 100000 # rows read at a time, so no table is ever loaded whole
+MAX_WORKERS = 2 # tables filtered in parallel (each worker holds one chunk at a time)
+
+# --- Sampling mode ---
+# 'random' : pandas sample of the clients; bureau and previous_application are filtered first because the other
+#            tables are filtered on the SK_ID_BUREAU / SK_ID_PREV they hold.
+# 'hash'   : a client is in the sample when a fixed hash of its SK_ID_CURR falls below SAMPLE_FRACTION, so a 1% sample
+#            is inside the 10% one, which is inside the 50% one, and reruns give the same clients. Every table is
+#            filtered on SK_ID_CURR in one independent pass, all of them in parallel.
+SAMPLING_MODE = 'random'
+HASH_SEED = 42
+STRATIFY_COLUMN = None # e.g. 'NAME_CONTRACT_TYPE': keep SAMPLE_FRACTION of the clients of every value of this column
+# Tables without SK_ID_CURR get it joined on from their parent: child file -> (parent file, key shared with the parent)
+JOINED_KEYS = {'bureau_balance.csv': ('bureau.csv', 'SK_ID_BUREAU')}
+CHILD_TABLES = ['bureau.csv', 'previous_application.csv', 'POS_CASH_balance.csv', 'installments_payments.csv',
+                'credit_card_balance.csv', 'bureau_balance.csv']
+
+
+def in_sorted(values: np.ndarray, sorted_ids: np.ndarray) -> np.ndarray:
+    """Vectorized membership test of values against a sorted array of IDs (binary search)."""
+    positions = np.searchsorted(sorted_ids, values)
+    positions[positions == len(sorted_ids)] = 0
+    return (sorted_ids[positions] == values) if len(sorted_ids) else np.zeros(len(values), dtype=bool)
+
+
+def filter_csv(filename: str, keys: dict, collect_key: str | None = None) -> np.ndarray | None:
+    """
+    Streams SOURCE_DATA_DIR/filename in chunks of CHUNK_SIZE rows and appends to SAMPLE_OUTPUT_DIR/filename
+    the rows whose value of any of the keys ({column: sorted array of IDs}) is in the sample.
+    Fields are copied as text, so the sampled file keeps the exact formatting of the source.
+    Returns the sorted distinct values of collect_key among the kept rows, if asked.
+    """
     print(f"Filtering {filename}...")
-    df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, filename))
-    # Keep rows if SK_ID_CURR is in our sample OR if SK_ID_PREV is in our sample
-    sampled_df = df[
-        df['SK_ID_CURR'].isin(sample_client_ids) |
-        df['SK_ID_PREV'].isin(sample_prev_ids)
-    ]
-    sampled_df.to_csv(os.path.join(SAMPLE_OUTPUT_DIR, filename), index=False)
-    print(f"Saved sampled {filename}.")
-
-# Finally, filter bureau_balance.csv based on the bureau IDs we found
-print("Filtering bureau_balance.csv...")
-bureau_balance_df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, 'bureau_balance.csv'))
-sampled_bureau_balance_df = bureau_balance_df[bureau_balance_df['SK_ID_BUREAU'].isin(sample_bureau_ids)]
-sampled_bureau_balance_df.to_csv(os.path.join(SAMPLE_OUTPUT_DIR, 'bureau_balance.csv'), index=False)
-print("Saved sampled bureau_balance.csv.")
-
-print("\n--- Sample creation complete! ---")
-print(f"Your new, smaller dataset is in the '{SAMPLE_OUTPUT_DIR}' folder.")
\ No newline at end of file
+    output_path = os.path.join(SAMPLE_OUTPUT_DIR, filename)
+    collected = []
+    rows_kept = 0
+    source_path = os.path.join(SOURCE_DATA_DIR, filename)
+    with open(output_path + '.tmp', 'w', newline='') as out:
+        pd.read_csv(source_path, nrows=0).to_csv(out, index=False) # header, even if no row is kept
+        for chunk in pd.read_csv(source_path, dtype=str, na_filter=False, chunksize=CHUNK_SIZE):
+            mask = np.zeros(len(chunk), dtype=bool)
+            for column, sorted_ids in keys.items():
+                mask |= in_sorted(pd.to_numeric(chunk[column], errors='coerce').fillna(-1).to_numpy(np.int64), sorted_ids)
+            sampled_chunk = chunk[mask]
+            sampled_chunk.to_csv(out, index=False, header=False)
+            rows_kept += len(sampled_chunk)
+            if collect_key:
+                collected.append(sampled_chunk[collect_key].to_numpy(np.int64))
+    os.replace(output_path + '.tmp', output_path)
+    print(f"Saved sampled {filename} ({rows_kept} rows).")
+    if collect_key is None:
+        return None
+    return np.unique(np.concatenate(collected)) if collected else np.array([], dtype=np.int64)
+
+
+def client_hash(client_ids: np.ndarray, seed: int = HASH_SEED) -> np.ndarray:
+    """
+    Deterministic hash of the client IDs mapped to [0, 1) (splitmix64 finalizer), independent of the row order,
+    of the platform and of the Python hash seed.
+    """
+    with np.errstate(over='ignore'):
+        z = client_ids.astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(2**53)
+
+
+def hash_sample(app_df: pd.DataFrame, fraction: float, stratify_column: str | None = None) -> np.ndarray:
+    """
+    Sorted SK_ID_CURR of the clients picked by their hash. With stratify_column, the round(fraction * n) clients
+    with the lowest hashes of every stratum are kept, so each value keeps its share of the clients.
+    """
+    hashes = pd.Series(client_hash(app_df['SK_ID_CURR'].to_numpy(np.int64)), index=app_df.index)
+    if stratify_column is None:
+        keep = hashes < fraction
+    else:
+        strata = app_df[stratify_column].astype(str) # missing values form their own stratum
+        rank = hashes.groupby(strata).rank(method='first')
+        keep = rank <= (hashes.groupby(strata).transform('size') * fraction).round()
+    return np.unique(app_df.loc[keep, 'SK_ID_CURR'].to_numpy(np.int64))
+
+
+def filter_table_by_clients(filename: str, sample_client_ids: np.ndarray):
+    """
+    One independent pass over a table for the hash mode: rows are kept on SK_ID_CURR, joined on first from the
+    parent's key columns for tables that do not carry it.
+    """
+    if filename not in JOINED_KEYS:
+        filter_csv(filename, {'SK_ID_CURR': sample_client_ids})
+        return
+    parent_filename, shared_key = JOINED_KEYS[filename]
+    shared_ids = []
+    for chunk in pd.read_csv(os.path.join(SOURCE_DATA_DIR, parent_filename), usecols=[shared_key, 'SK_ID_CURR'],
+                             dtype='int64', chunksize=CHUNK_SIZE):
+        shared_ids.append(chunk[shared_key].to_numpy()[in_sorted(chunk['SK_ID_CURR'].to_numpy(), sample_client_ids)])
+    filter_csv(filename, {shared_key: np.unique(np.concatenate(shared_ids)) if shared_ids else np.array([], dtype=np.int64)})
+
+
+def create_sample(mode: str = SAMPLING_MODE, fraction: float = SAMPLE_FRACTION, stratify_column: str | None = STRATIFY_COLUMN,
+                  max_workers: int = MAX_WORKERS):
+    # --- Create the sample ---
+    print(f"--- Creating a {fraction*100}% sample of the data ({mode} mode) ---")
+
+    # 1. Read the main application file (small, ~26 MB)
+    app_df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, 'application_test.csv'))
+
+    # 2. Get a sample of client IDs
+    if mode == 'hash':
+        sample_client_ids = hash_sample(app_df, fraction, stratify_column)
+        sampled_app_df = app_df[in_sorted(app_df['SK_ID_CURR'].to_numpy(np.int64), sample_client_ids)]
+    else:
+        sampled_app_df = app_df.sample(frac=fraction, random_state=42) # random_state for reproducibility
+        sample_client_ids = np.unique(sampled_app_df['SK_ID_CURR'].to_numpy(np.int64))
+
+    print(f"Sampled {len(sample_client_ids)} client IDs.")
+
+    # 3. Create the new output directory
+    if not os.path.exists(SAMPLE_OUTPUT_DIR):
+        os.makedirs(SAMPLE_OUTPUT_DIR)
+        print(f"Created output directory: {SAMPLE_OUTPUT_DIR}")
+
+    # 4. Save the new, smaller application_test.csv
+    sampled_app_df.to_csv(os.path.join(SAMPLE_OUTPUT_DIR, 'application_test.csv'), index=False)
+    print("Saved sampled application_test.csv.")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        if mode == 'hash':
+            # 5. Every table in one independent pass, all of them in parallel
+            jobs = [executor.submit(filter_table_by_clients, filename, sample_client_ids) for filename in CHILD_TABLES]
+        else:
+            # 5. bureau and previous_application, filtered on the sampled clients; they give back the related
+            #    SK_ID_BUREAU and SK_ID_PREV needed by the other tables
+            bureau_job = executor.submit(filter_csv, 'bureau.csv', {'SK_ID_CURR': sample_client_ids}, 'SK_ID_BUREAU')
+            prev_app_job = executor.submit(filter_csv, 'previous_application.csv', {'SK_ID_CURR': sample_client_ids}, 'SK_ID_PREV')
+            sample_bureau_ids = bureau_job.result()
+            sample_prev_ids = prev_app_job.result()
+
+            # 6. The remaining files: keep rows if SK_ID_CURR is in our sample OR if SK_ID_PREV is in our sample,
+            #    and bureau_balance.csv based on the bureau IDs we found
+            jobs = [executor.submit(filter_csv, filename, {'SK_ID_CURR': sample_client_ids, 'SK_ID_PREV': sample_prev_ids})
+                    for filename in ['POS_CASH_balance.csv', 'installments_payments.csv', 'credit_card_balance.csv']]
+            jobs.append(executor.submit(filter_csv, 'bureau_balance.csv', {'SK_ID_BUREAU': sample_bureau_ids}))
+        for job in jobs:
+            job.result()
+
+    print("\n--- Sample creation complete! ---")
+    print(f"Your new, smaller dataset is in the '{SAMPLE_OUTPUT_DIR}' folder.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create a smaller, consistent sample of the source CSVs.")
+    parser.add_argument('--mode', choices=['random', 'hash'], default=SAMPLING_MODE, help="How the clients are picked.")
+    parser.add_argument('--fraction', type=float, default=SAMPLE_FRACTION, help="Share of the clients kept (0.01, 0.1, 0.5...).")
+    parser.add_argument('--stratify', default=STRATIFY_COLUMN, help="application_test column to stratify on (hash mode).")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Number of tables filtered in parallel.")
+    args = parser.parse_args()
+
+    create_sample(mode=args.mode, fraction=args.fraction, stratify_column=args.stratify, max_workers=args.workers)
@@ -0,0 +1,208 @@
+"""
+Local, size-bounded disk cache for the Parquet objects the dashboard reads from S3.
+
+Objects are cached in fixed-size blocks, so a footer or a single row group of a large file only stores the
+bytes around it, while the small per-client files end up whole in a block or two. A block is keyed on the
+object's path and version (size and modification time, from one HEAD request re-checked every
+REVALIDATE_SECONDS): when the object is rewritten, its old blocks are simply no longer referenced and age out.
+The least recently used blocks are evicted once the cache exceeds its size cap; the recency survives restarts
+through the block files' modification times, so a restarted process or a new replica on the same disk starts warm.
+
+CachingFileSystemHandler wraps any pyarrow filesystem with the cache (pafs.PyFileSystem), so datasets,
+pq.read_table and ranged reads all go through it without changes.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.fs as pafs
+
+from storage import DelegatingHandler, RangedFile
+
+# --- Configuration ---
+BLOCK_SIZE = 1024 * 1024 # bytes per cached block (and smallest read sent to the source on a miss)
+REVALIDATE_SECONDS = 300 # an object's version is checked against the source at most this often
+BLOCK_SUFFIX = '.blk'
+
+
+class DiskCache:
+    """Thread-safe LRU store of object blocks on local disk, bounded to max_bytes, with hit/miss counters."""
+
+    def __init__(self, cache_dir: str, max_bytes: int, block_size: int = BLOCK_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict() # block file name -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes_from_cache': 0, 'bytes_from_source': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Blocks left by previous processes, oldest first
+        existing = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(BLOCK_SUFFIX):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name, stat.st_size))
+            elif entry.name.endswith('.tmp'):
+                os.remove(entry.path) # write interrupted by a crash
+        for _, name, size in sorted(existing):
+            self._blocks[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def block_name(path: str, version: str, block: int) -> str:
+        return f"{hashlib.sha1(f'{path}|{version}'.encode()).hexdigest()}-{block:06d}{BLOCK_SUFFIX}"
+
+    def get(self, name: str) -> bytes | None:
+        """Returns a cached block and marks it as recently used, or None."""
+        with self._lock:
+            if name not in self._blocks:
+                self.counters['misses'] += 1
+                return None
+            self._blocks.move_to_end(name)
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path) # persists the recency for the next process
+        except FileNotFoundError:
+            # Evicted by another process sharing the folder
+            with self._lock:
+                self._total_bytes -= self._blocks.pop(name, 0)
+                self.counters['misses'] += 1
+            return None
+        with self._lock:
+            self.counters['hits'] += 1
+            self.counters['bytes_from_cache'] += len(data)
+        return data
+
+    def put(self, name: str, data: bytes):
+        """Stores a block (atomically, so a reader never sees a partial file) and evicts down to the size cap."""
+        if len(data) > self.max_bytes:
+            return
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes += len(data) - self._blocks.pop(name, 0)
+            self._blocks[name] = len(data)
+            self.counters['bytes_from_source'] += len(data)
+            self._evict()
+
+    def _evict(self):
+        # Called with the lock held (or from __init__)
+        while self._total_bytes > self.max_bytes and self._blocks:
+            name, size = self._blocks.popitem(last=False)
+            self._total_bytes -= size
+            self.counters['evictions'] += 1
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        """Counters plus the current size and the block hit rate."""
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {**self.counters, 'blocks': len(self._blocks), 'size_mb': self._total_bytes / (1024 * 1024),
+                    'hit_rate': self.counters['hits'] / lookups if lookups else 0.0}
+
+
+class CachedFile(RangedFile):
+    """Seekable read-only file over one object version, served block by block from the cache or the source."""
+
+    def __init__(self, cache: DiskCache, source_fs: pafs.FileSystem, path: str, size: int, version: str):
+        super().__init__(size)
+        self._cache = cache
+        self._source_fs = source_fs
+        self._path = path
+        self._version = version
+        self._source = None # opened on the first miss only
+        self._open_blocks = {} # blocks already read through this handle (Parquet readers issue many small reads)
+
+    def read_at(self, nbytes: int, offset: int) -> bytes:
+        """Bytes [offset, offset + nbytes) of the object; consecutive missing blocks are fetched in one ranged read."""
+        end = min(offset + nbytes, self._size)
+        if end <= offset:
+            return b''
+        block_size = self._cache.block_size
+        first, last = offset // block_size, (end - 1) // block_size
+        blocks = {block: self._open_blocks[block] if block in self._open_blocks
+                  else self._cache.get(self._cache.block_name(self._path, self._version, block))
+                  for block in range(first, last + 1)}
+
+        block = first
+        while block <= last:
+            if blocks[block] is not None:
+                block += 1
+                continue
+            run_end = block
+            while run_end + 1 <= last and blocks[run_end + 1] is None:
+                run_end += 1
+            if self._source is None:
+                self._source = self._source_fs.open_input_file(self._path)
+            start = block * block_size
+            data = self._source.read_at(min((run_end + 1) * block_size, self._size) - start, start)
+            for missing in range(block, run_end + 1):
+                blocks[missing] = data[(missing - block) * block_size:(missing - block + 1) * block_size]
+                self._cache.put(self._cache.block_name(self._path, self._version, missing), blocks[missing])
+            block = run_end + 1
+
+        self._open_blocks.update(blocks)
+        data = b''.join(blocks[block] for block in range(first, last + 1))
+        start = offset - first * block_size
+        return data[start:start + end - offset]
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+        super().close()
+
+
+class CachingFileSystemHandler(DelegatingHandler):
+    """
+    Read-through handler for pafs.PyFileSystem: file contents come from the disk cache, everything else
+    (listing, file info, writes) goes straight to the wrapped filesystem.
+    """
+
+    def __init__(self, source_fs: pafs.FileSystem, cache: DiskCache):
+        super().__init__(source_fs)
+        self.cache = cache
+        self._versions = {} # path -> (size, version, time of the check)
+        self._lock = threading.Lock()
+
+    def _version(self, path: str) -> tuple[int, str]:
+        with self._lock:
+            known = self._versions.get(path)
+        if known and time.monotonic() - known[2] < REVALIDATE_SECONDS:
+            return known[0], known[1]
+        info = self.source_fs.get_file_info(path)
+        if info.type == pafs.FileType.NotFound:
+            raise FileNotFoundError(path)
+        # pyarrow does not expose S3 ETags: size + modification time identify the object version instead
+        version = f"{info.size}-{info.mtime_ns}"
+        with self._lock:
+            self._versions[path] = (info.size, version, time.monotonic())
+        return info.size, version
+
+    def open_input_file(self, path):
+        size, version = self._version(path)
+        return pa.PythonFile(CachedFile(self.cache, self.source_fs, path, size, version), mode='r')
+
+    def get_type_name(self):
+        return f"cached+{self.source_fs.type_name}"
+
+    def __eq__(self, other):
+        return isinstance(other, CachingFileSystemHandler) and other.source_fs.equals(self.source_fs) and other.cache is self.cache
+
+
+def cached_filesystem(source_fs: pafs.FileSystem, cache: DiskCache) -> pafs.FileSystem:
+    """source_fs behind the disk cache, usable anywhere pyarrow takes a filesystem."""
+    return pafs.PyFileSystem(CachingFileSystemHandler(source_fs, cache))
@@ -0,0 +1,207 @@
+"""
+Synthetic scale-up data generator for load and capacity testing.
+
+Learns from the CSVs in SOURCE_DATA_DIR:
+- the distribution of every column of every table (empirical quantiles for numeric columns, value frequencies
+  for text and low-cardinality columns, and the share of missing values),
+- the number of child rows per parent (bureau and previous applications per client, bureau_balance rows per
+  bureau loan, POS/installment/card rows per previous application), including the parents without children,
+then writes any number of synthetic clients with the same schemas and the same SK_ID_CURR / SK_ID_PREV /
+SK_ID_BUREAU relationships, CLIENTS_PER_CHUNK clients at a time, so the output size is not bounded by memory.
+
+Usage: python generate_synthetic_data.py --scale 10            (10x the clients of the source)
+       python generate_synthetic_data.py --clients 5000000
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+SOURCE_DATA_DIR = 'data_sample'
+SYNTHETIC_OUTPUT_DIR = 'data_synthetic'
+CHUNK_SIZE = 200000 # source rows read at a time while learning
+PROFILE_ROWS = 200000 # rows per table kept (uniformly) to learn the column distributions
+QUANTILES = 1001 # points of the empirical distribution kept per numeric column
+MAX_DISCRETE_VALUES = 50 # numeric columns with fewer distinct values are sampled as categories (flags, counts...)
+CLIENTS_PER_CHUNK = 5000 # clients generated and written at a time
+RANDOM_SEED = 42
+
+# First IDs of the synthetic keys (the real ones start around these values)
+FIRST_IDS = {'SK_ID_CURR': 100001, 'SK_ID_BUREAU': 5000000, 'SK_ID_PREV': 1000000}
+
+# Table -> (own key or None, parent key): every row of the table belongs to one parent row.
+# The tables of one level only depend on the level above, in this order.
+TABLE_RELATIONS = {
+    'application_test.csv': ('SK_ID_CURR', None),
+    'bureau.csv': ('SK_ID_BUREAU', 'SK_ID_CURR'),
+    'previous_application.csv': ('SK_ID_PREV', 'SK_ID_CURR'),
+    'bureau_balance.csv': (None, 'SK_ID_BUREAU'),
+    'POS_CASH_balance.csv': (None, 'SK_ID_PREV'),
+    'installments_payments.csv': (None, 'SK_ID_PREV'),
+    'credit_card_balance.csv': (None, 'SK_ID_PREV')
+}
+# Columns numbering the rows of a parent rather than drawn independently: column -> (first value, step)
+SEQUENCE_COLUMNS = {'MONTHS_BALANCE': (0, -1), 'NUM_INSTALMENT_NUMBER': (1, 1)}
+
+
+def _profile_sample(path: str, rng: np.random.Generator) -> pd.DataFrame:
+    """Reads the CSV in chunks and keeps about PROFILE_ROWS rows drawn uniformly from the whole file."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        first_lines = f.read(1024 * 1024)
+    bytes_per_row = len(first_lines) / max(first_lines.count(b'\n'), 1)
+    estimated_rows = max((os.path.getsize(path) - len(header)) / bytes_per_row, 1)
+    keep_probability = min(1.0, PROFILE_ROWS / estimated_rows)
+
+    parts = []
+    for chunk in pd.read_csv(path, chunksize=CHUNK_SIZE, low_memory=False):
+        parts.append(chunk[rng.random(len(chunk)) < keep_probability])
+    return pd.concat(parts, ignore_index=True)
+
+
+def learn_column(series: pd.Series) -> dict:
+    """Distribution of one column: value frequencies for text and discrete columns, quantiles otherwise."""
+    values = series.dropna()
+    profile = {'null_rate': 1 - len(values) / len(series) if len(series) else 1.0}
+    if values.empty:
+        profile['kind'] = 'empty'
+    elif not pd.api.types.is_numeric_dtype(values) or values.nunique() < MAX_DISCRETE_VALUES:
+        frequencies = values.value_counts(normalize=True)
+        profile.update(kind='discrete', values=frequencies.index.to_numpy(), probabilities=frequencies.to_numpy())
+    else:
+        profile.update(kind='continuous', quantiles=np.quantile(values.to_numpy(np.float64), np.linspace(0, 1, QUANTILES)),
+                       integer=bool((values % 1 == 0).all()))
+    return profile
+
+
+def count_children(path: str, parent_key: str) -> pd.Series:
+    """Rows per parent key value in a child table, counted from the key column only."""
+    counts = []
+    for chunk in pd.read_csv(path, usecols=[parent_key], chunksize=CHUNK_SIZE * 5):
+        counts.append(chunk[parent_key].value_counts())
+    return pd.concat(counts).groupby(level=0).sum() if counts else pd.Series(dtype='int64')
+
+
+def learn_profiles(source_dir: str = SOURCE_DATA_DIR, seed: int = RANDOM_SEED) -> dict:
+    """
+    Learns the column distributions and the children-per-parent distributions of every table.
+    Returns {table: {'columns': [...], 'profiles': {column: profile}, 'children': (counts, probabilities)}}.
+    """
+    rng = np.random.default_rng(seed)
+    parent_ids = {}
+    profiles = {}
+    for filename, (own_key, parent_key) in TABLE_RELATIONS.items():
+        path = os.path.join(source_dir, filename)
+        print(f"Learning {filename}...")
+        sample_df = _profile_sample(path, rng)
+        table = {'columns': list(sample_df.columns),
+                 'profiles': {column: learn_column(sample_df[column]) for column in sample_df.columns
+                              if column not in FIRST_IDS and column not in SEQUENCE_COLUMNS}}
+        if own_key:
+            parent_ids[own_key] = pd.concat([chunk[own_key] for chunk in
+                                             pd.read_csv(path, usecols=[own_key], chunksize=CHUNK_SIZE * 5)]).unique()
+        if parent_key:
+            # Parents without any row here count as 0 children
+            counts = count_children(path, parent_key).reindex(parent_ids[parent_key], fill_value=0)
+            distribution = counts.value_counts(normalize=True).sort_index()
+            table['children'] = (distribution.index.to_numpy(np.int64), distribution.to_numpy())
+            print(f"  -> {len(counts)} parents, {counts.mean():.2f} rows per {parent_key} on average.")
+        profiles[filename] = table
+    return profiles
+
+
+def draw_column(profile: dict, n: int, rng: np.random.Generator) -> pd.Series:
+    """Draws n values of a column from its learned distribution."""
+    if profile['kind'] == 'empty':
+        return pd.Series([np.nan] * n)
+    if profile['kind'] == 'discrete':
+        values = pd.Series(rng.choice(profile['values'], size=n, p=profile['probabilities']))
+    else:
+        values = pd.Series(np.interp(rng.random(n), np.linspace(0, 1, QUANTILES), profile['quantiles']))
+        if profile['integer']:
+            values = values.round().astype('Int64')
+    if profile['null_rate'] > 0:
+        values = values.where(rng.random(n) >= profile['null_rate'])
+    return values
+
+
+def generate_rows(table: dict, keys: dict, n: int, positions: np.ndarray | None, rng: np.random.Generator) -> pd.DataFrame:
+    """Builds n rows of a table: the given key columns, the sequence columns, and every other column drawn."""
+    data = {}
+    for column in table['columns']:
+        if column in keys:
+            data[column] = keys[column]
+        elif column in SEQUENCE_COLUMNS:
+            first, step = SEQUENCE_COLUMNS[column]
+            data[column] = first + step * positions
+        else:
+            data[column] = draw_column(table['profiles'][column], n, rng).to_numpy()
+    return pd.DataFrame(data, columns=table['columns'])
+
+
+def generate_dataset(profiles: dict, n_clients: int, output_dir: str = SYNTHETIC_OUTPUT_DIR, seed: int = RANDOM_SEED):
+    """Writes n_clients synthetic clients and all their related rows, CLIENTS_PER_CHUNK clients at a time."""
+    rng = np.random.default_rng(seed + 1)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    next_ids = dict(FIRST_IDS)
+    rows_written = {filename: 0 for filename in TABLE_RELATIONS}
+    start_time = time.perf_counter()
+
+    for chunk_start in range(0, n_clients, CLIENTS_PER_CHUNK):
+        chunk_clients = min(CLIENTS_PER_CHUNK, n_clients - chunk_start)
+        print(f"  -> Generating clients {chunk_start + 1} to {chunk_start + chunk_clients} of {n_clients}...")
+        # Key values generated so far in this chunk, with the client each one belongs to
+        generated = {'SK_ID_CURR': (np.arange(next_ids['SK_ID_CURR'], next_ids['SK_ID_CURR'] + chunk_clients),) * 2}
+        next_ids['SK_ID_CURR'] += chunk_clients
+
+        for filename, (own_key, parent_key) in TABLE_RELATIONS.items():
+            table = profiles[filename]
+            if parent_key is None:
+                parents, clients = generated[own_key]
+                n, positions, keys = len(parents), None, {own_key: parents}
+            else:
+                parents, clients = generated[parent_key]
+                counts, probabilities = table['children']
+                children = rng.choice(counts, size=len(parents), p=probabilities)
+                n = int(children.sum())
+                # Position of every row within its parent, 0 for the first row
+                positions = np.arange(n) - np.repeat(np.cumsum(children) - children, children)
+                keys = {parent_key: np.repeat(parents, children), 'SK_ID_CURR': np.repeat(clients, children)}
+                if own_key:
+                    keys[own_key] = np.arange(next_ids[own_key], next_ids[own_key] + n)
+                    next_ids[own_key] += n
+                    generated[own_key] = (keys[own_key], keys['SK_ID_CURR'])
+
+            rows = generate_rows(table, keys, n, positions, rng)
+            path = os.path.join(output_dir, filename)
+            rows.to_csv(path, mode='w' if chunk_start == 0 else 'a', header=(chunk_start == 0), index=False)
+            rows_written[filename] += n
+
+    seconds = time.perf_counter() - start_time
+    print("\n--- Generation summary ---")
+    for filename, rows in rows_written.items():
+        print(f"{filename:<28} {rows:>14,} rows")
+    print(f"Generated {n_clients} clients in {seconds:.1f} s into '{output_dir}'.")
+    return rows_written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset shaped like the source CSVs.")
+    parser.add_argument('--source', default=SOURCE_DATA_DIR, help="Folder of the CSVs to learn from.")
+    parser.add_argument('--output', default=SYNTHETIC_OUTPUT_DIR, help="Folder the synthetic CSVs are written to.")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--scale', type=float, default=10, help="Number of clients as a multiple of the source's.")
+    size.add_argument('--clients', type=int, help="Exact number of clients to generate.")
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED, help="Seed of the learning sample and of the generator.")
+    args = parser.parse_args()
+
+    print("--- Learning the source distributions ---")
+    learned_profiles = learn_profiles(args.source, args.seed)
+    source_clients = len(pd.read_csv(os.path.join(args.source, 'application_test.csv'), usecols=['SK_ID_CURR']))
+    n_clients = args.clients if args.clients else int(round(source_clients * args.scale))
+    print(f"\n--- Generating {n_clients} synthetic clients ---")
+    generate_dataset(learned_profiles, n_clients, args.output, args.seed)
@@ -0,0 +1,121 @@
+"""
+Column-at-a-time JSON encoder for the DataFrames sent to the prediction API.
+
+encode_records(df) produces exactly the bytes of json.dumps(prepare_df_for_json(df)) (the body requests builds
+from the records), without one Python dict per row: every column is turned into its JSON fragments in one pass
+over its NumPy array (Python's own float/int/str encoders mapped over the column, nulls and non-finite numbers
+masked to null with NumPy), then the rows are assembled from a single format template.
+encode_columns(df) is the optional column-oriented layout: {"column": [values...], ...}.
+The iter_* variants yield the same text in pieces (CHUNK_ROWS rows, or one column, at a time).
+Columns of a dtype the fast path does not know are encoded value by value, as before, so the output never differs.
+Column names must be unique.
+"""
+
+import json
+from json.encoder import encode_basestring_ascii
+import numpy as np
+import pandas as pd
+
+# Text that prepare_df_for_json turns into null in object columns (after astype(str))
+NULL_TOKENS = ['inf', '-inf', 'Infinity', '-Infinity', 'NaN', 'nan', 'None', 'null', 'NA', '<NA>']
+CHUNK_ROWS = 2000 # rows encoded at a time by the streaming encoders (iter_records, iter_payload)
+
+
+def _reference_fragments(values: pd.Series) -> np.ndarray:
+    """Value-by-value encoding, as json.dumps does it after astype(object).where(notnull, None)."""
+    objects = values.astype(object).where(values.notnull(), None)
+    return np.array([json.dumps(value, allow_nan=False) for value in objects], dtype=object)
+
+
+def _number_fragments(array: np.ndarray) -> np.ndarray:
+    """JSON of a numeric column: repr of every value, NaN and +/-inf as null."""
+    if array.dtype.kind == 'b':
+        return np.where(array, 'true', 'false').astype(object)
+    encode = int.__repr__ if array.dtype.kind in 'iu' else float.__repr__
+    fragments = np.array(list(map(encode, array.tolist())), dtype=object)
+    if array.dtype.kind == 'f':
+        fragments[~np.isfinite(array)] = 'null'
+    return fragments
+
+
+def column_fragments(column: pd.Series) -> np.ndarray:
+    """JSON fragment of every value of a column, following prepare_df_for_json's rules for its dtype."""
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Categories (never null) are encoded once, then picked by code; code -1 (missing) lands on the trailing null
+        categorical = column.array
+        encoded_categories = [json.dumps(value, allow_nan=False) for value in categorical.categories.astype(object)]
+        return np.array(encoded_categories + ['null'], dtype=object)[categorical.codes]
+    if not isinstance(dtype, np.dtype):
+        return _reference_fragments(column)
+    if dtype.kind in 'biuf':
+        return _number_fragments(column.to_numpy())
+    if dtype == object:
+        try:
+            text = column.astype(str).to_numpy()
+        except Exception:
+            return _reference_fragments(column)
+        fragments = np.array(list(map(encode_basestring_ascii, text)), dtype=object)
+        fragments[np.isin(text, NULL_TOKENS)] = 'null'
+        return fragments
+    return _reference_fragments(column)
+
+
+def _key_fragments(df: pd.DataFrame) -> list:
+    """'"column": ' for every column, with json.dumps' conversion of non-string names (1 -> "1")."""
+    if not df.columns.is_unique:
+        raise ValueError("JSON encoding needs unique column names.")
+    return [json.dumps({column: None}, allow_nan=False)[1:-len('null}')] for column in df.columns]
+
+
+def iter_records(df: pd.DataFrame | None, chunk_rows: int = CHUNK_ROWS):
+    """encode_records in pieces of at most chunk_rows rows, so a long table is never held as one string."""
+    if df is None or df.empty:
+        yield '[]'
+        return
+    # One template per table: {"col_a": %s, "col_b": %s}; '%' in a column name is escaped for the formatting
+    template = '{' + ', '.join(key.replace('%', '%%') + '%s' for key in _key_fragments(df)) + '}'
+    for start in range(0, len(df), chunk_rows):
+        chunk = df if len(df) <= chunk_rows else df.iloc[start:start + chunk_rows]
+        columns = [column_fragments(column) for _, column in chunk.items()]
+        yield ('[' if start == 0 else ', ') + ', '.join(template % row for row in zip(*columns))
+    yield ']'
+
+
+def iter_columns(df: pd.DataFrame | None):
+    """encode_columns in pieces, one per column."""
+    if df is None or df.empty:
+        yield '{}'
+        return
+    for i, (key, (_, column)) in enumerate(zip(_key_fragments(df), df.items())):
+        yield f"{', ' if i else '{'}{key}[{', '.join(column_fragments(column))}]"
+    yield '}'
+
+
+def encode_records(df: pd.DataFrame | None) -> str:
+    """JSON array of the rows of df, byte-compatible with json.dumps(prepare_df_for_json(df))."""
+    return ''.join(iter_records(df))
+
+
+def encode_columns(df: pd.DataFrame | None) -> str:
+    """Column-oriented layout, {"column": [values...], ...}, with the same value encoding as encode_records."""
+    return ''.join(iter_columns(df))
+
+
+def iter_payload(tables: dict, layout: str = 'records'):
+    """
+    UTF-8 JSON body {"table name": encoded table, ...} in pieces (a chunk of rows, or a column with 'columns'),
+    for consumers that stream it, such as the request compressor.
+    """
+    iterate = iter_columns if layout == 'columns' else iter_records
+    yield b'{'
+    for i, (name, df) in enumerate(tables.items()):
+        yield f"{', ' if i else ''}{encode_basestring_ascii(name)}: ".encode('utf-8')
+        for piece in iterate(df):
+            yield piece.encode('utf-8')
+    yield b'}'
+
+
+def encode_payload(tables: dict, layout: str = 'records') -> bytes:
+    """UTF-8 JSON body {"table name": encoded table, ...}, tables in the given order."""
+    return b''.join(iter_payload(tables, layout))
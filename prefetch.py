@@ -0,0 +1,126 @@
+"""
+Predictive prefetching of the clients an analyst is likely to open next.
+
+Analysts mostly walk through the sidebar selectbox in order, or go back to clients they just looked at. Once a
+page is rendered, the next and previous IDs of available_ids and the recently viewed IDs are loaded in the
+background through get_data_for_client, so they are already in the result cache when selected.
+- At most PREFETCH_WORKERS loads run at a time, shared by all sessions.
+- Nothing is prefetched while the result cache holds more than PREFETCH_MEMORY_SHARE of its budget, so the
+  prefetches never push out what the analysts actually opened.
+- Jumping to a client that was not predicted cancels the session's pending prefetches; selecting a predicted one
+  waits for its prefetch instead of loading it a second time.
+"""
+
+import threading
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+import streamlit as st
+
+from utils import get_data_for_client, get_client_result_cache
+
+# --- Configuration ---
+PREFETCH_AHEAD = 2 # next IDs of the selectbox
+PREFETCH_BEHIND = 1 # previous IDs of the selectbox
+PREFETCH_RECENT = 3 # recently viewed IDs
+PREFETCH_WORKERS = 2 # concurrent prefetch loads for the whole process
+PREFETCH_MEMORY_SHARE = 0.5 # share of the result cache budget beyond which nothing is prefetched
+PREFETCH_WAIT_SECONDS = 30 # longest a view waits for the prefetch of its own client
+RECENT_HISTORY = 10 # viewed IDs remembered per session
+
+
+def prefetch_candidates(client_id: int, available_ids: list, recent_ids: list) -> list:
+    """IDs worth loading ahead of time: the next ones, the previous ones, then the recent ones, without duplicates."""
+    candidates = []
+    if client_id in available_ids:
+        position = available_ids.index(client_id)
+        candidates += available_ids[position + 1:position + 1 + PREFETCH_AHEAD]
+        candidates += available_ids[max(position - PREFETCH_BEHIND, 0):position][::-1]
+    candidates += [recent_id for recent_id in reversed(recent_ids) if recent_id != client_id][:PREFETCH_RECENT]
+    return list(dict.fromkeys(candidates))
+
+
+class ClientPrefetcher:
+    """Bounded pool of background get_data_for_client loads, planned and cancelled per session."""
+
+    def __init__(self, max_workers: int = PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._planned = {} # session -> {client ID: Future}
+        self.counters = {'prefetched': 0, 'already_cached': 0, 'over_budget': 0, 'cancelled': 0, 'failed': 0}
+
+    def _prefetch(self, client_id: int):
+        # No script context in this thread: a failed load shows no st.error (it is printed), the real view retries it
+        cache = get_client_result_cache()
+        cache_stats = cache.stats()
+        if client_id in cache:
+            outcome = 'already_cached'
+        elif cache_stats['size_mb'] > PREFETCH_MEMORY_SHARE * cache_stats['budget_mb']:
+            outcome = 'over_budget'
+        else:
+            try:
+                outcome = 'prefetched' if get_data_for_client(client_id)[0] is not None else 'failed'
+            except Exception as e:
+                print(f"Prefetch of client {client_id} failed: {e}")
+                print(traceback.format_exc())
+                outcome = 'failed'
+        with self._lock:
+            self.counters[outcome] += 1
+
+    def schedule(self, session: str, candidates: list):
+        """Makes candidates the session's plan: prefetches no longer wanted are cancelled, new ones are queued."""
+        with self._lock:
+            planned = self._planned.get(session, {})
+            for client_id, future in planned.items():
+                if client_id not in candidates and future.cancel():
+                    self.counters['cancelled'] += 1
+            self._planned[session] = {client_id: planned[client_id] if client_id in planned and not planned[client_id].cancelled()
+                                      else self._executor.submit(self._prefetch, client_id) for client_id in candidates}
+
+    def claim(self, session: str, client_id: int) -> Future | None:
+        """
+        Called when the session opens client_id: returns its prefetch if it is already running or done. Otherwise
+        (the user jumped elsewhere, or got there before its turn) the session's pending prefetches are cancelled.
+        """
+        with self._lock:
+            planned = self._planned.get(session, {})
+            if client_id in planned and (planned[client_id].running() or planned[client_id].done()):
+                return planned[client_id]
+            for future in planned.values():
+                if future.cancel():
+                    self.counters['cancelled'] += 1
+            self._planned[session] = {}
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+@st.cache_resource
+def get_prefetcher() -> ClientPrefetcher:
+    """The process-wide prefetcher, so PREFETCH_WORKERS bounds the background loads of all sessions together."""
+    return ClientPrefetcher(PREFETCH_WORKERS)
+
+
+def _session_key() -> str:
+    if 'prefetch_session' not in st.session_state:
+        st.session_state.prefetch_session = uuid.uuid4().hex
+    return st.session_state.prefetch_session
+
+
+def claim_prefetched(client_id: int):
+    """Before a view loads client_id: waits for its prefetch if one is running, or cancels the stale plan."""
+    future = get_prefetcher().claim(_session_key(), client_id)
+    if future is not None and not future.cancelled():
+        try:
+            future.result(timeout=PREFETCH_WAIT_SECONDS)
+        except Exception:
+            pass # the view loads the client itself
+
+
+def prefetch_around(client_id: int, available_ids: list):
+    """After a view: remembers client_id as recently viewed and plans the prefetch of the likely next clients."""
+    recent_ids = [recent_id for recent_id in st.session_state.get('recent_client_ids', []) if recent_id != client_id]
+    st.session_state.recent_client_ids = (recent_ids + [client_id])[-RECENT_HISTORY:]
+    get_prefetcher().schedule(_session_key(), prefetch_candidates(client_id, available_ids, recent_ids))
@@ -46,17 +46,114 @@ When pandas reads the Parquet file for client 100003, it says:
 
 """
 
+import argparse
+import hashlib
+import itertools
+import json
 import pandas as pd
+import numpy as np
 import os
+import shutil
+import threading
+import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 import pyarrow.parquet as pq
 import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
 
 # This is the definitive pre-processing script.
 
 # --- Configuration ---
 SOURCE_DATA_DIR = 'data_sample'
 OUTPUT_PARQUET_DIR = 'data_parquet'
+CHUNK_SIZE = 500000 # rows per chunk for the pandas engine
+
+# --- Layout configuration ---
+# 'hive'   : one folder per partition value (SK_ID_CURR=100002/...), the original layout.
+# 'sorted' : each table sorted by its partition key into a few large files with small row groups,
+#            plus an offset index (_client_index.parquet) mapping each key to (file, row group, row range).
+#            A client lookup is then one ranged read per table, whatever the number of clients.
+LAYOUT_MODE = 'hive'
+SORTED_ROWS_PER_FILE = 2000000
+SORTED_ROW_GROUP_SIZE = 5000
+# The leading underscore makes pyarrow's dataset discovery skip the index when the folder is scanned.
+CLIENT_INDEX_FILENAME = '_client_index.parquet'
+# The hive layout gets a partition manifest instead: one row per file with its partition value, path, row count
+# and min/max statistics, so a reader resolves a client to its object keys without listing the folder.
+PARTITION_MANIFEST_FILENAME = '_partition_manifest.parquet'
+PARTITION_MANIFEST_STATS_COLUMNS = ['SK_ID_BUREAU', 'SK_ID_PREV', 'MONTHS_BALANCE']
+# 'bucketed' : the partition key is hashed into BUCKET_COUNT files, each sorted by the key and written with
+#              small row groups, min/max statistics and a page index. The file count no longer grows with the
+#              number of clients, and a lookup reads one file footer plus the one row group holding the key.
+BUCKET_COUNT = 64
+BUCKETED_ROW_GROUP_SIZE = 2000
+BUCKET_LAYOUT_FILENAME = '_bucket_layout.json'
+
+# Per-table build manifests (checksums, committed chunks, output files) live in this sub-folder.
+MANIFEST_DIRNAME = '_build_manifest'
+
+# --- Conversion engine ---
+# 'pandas' : pd.read_csv in chunks, then one pandas -> Arrow conversion per chunk (the original path).
+# 'arrow'  : Arrow's incremental CSV reader streams record batches straight into the Parquet writer.
+CONVERSION_ENGINE = 'pandas'
+ARROW_BLOCK_SIZE = 64 * 1024 * 1024 # bytes of CSV parsed per batch
+# Tables converted in parallel; each worker process handles one table at a time.
+MAX_WORKERS = 1
+
+# --- Memory-bounded mode (--memory-budget) ---
+# With a budget (MB per worker process) the chunk sizes are derived from the measured width of a row, and the
+# sorted/bucketed layouts spill the table to on-disk runs that are sorted and written one at a time instead of
+# concatenating the whole table in memory. 0 keeps the fixed CHUNK_SIZE / ARROW_BLOCK_SIZE and the in-memory sort.
+MEMORY_BUDGET_MB = 0
+SIZING_SAMPLE_ROWS = 10000 # rows parsed to measure the width of a row
+CHUNK_BUDGET_SHARE = 0.25 # share of the budget one chunk may take once converted to Arrow
+PANDAS_ROW_OVERHEAD = 3 # pandas holds a chunk in about 3x its Arrow size (object strings, intermediate copies)
+RUN_BUDGET_SHARE = 0.2 # share of the budget one spilled run may take (the sort copies it once)
+BOUNDED_MAX_OPEN_FILES = 128 # hive layout: fewer partition files open at once means fewer write buffers held
+RSS_SAMPLE_INTERVAL = 0.05 # seconds between two RSS samples
+
+# --- Client bundle store (optional, --bundles) ---
+# Every client's rows from the seven tables packed into one zstd-compressed record of a single file,
+# with an offset index, so the dashboard fetches a whole client in one small ranged read.
+BUNDLE_DIRNAME = 'client_bundles'
+BUNDLE_DATA_FILENAME = 'bundles.bin'
+BUNDLE_INDEX_FILENAME = '_bundle_index.parquet'
+BUNDLE_CLIENTS_PER_BATCH = 20000 # clients read from the Parquet tables at a time, bounds the memory used
+BUNDLE_COMPRESSION = 'zstd'
+# Payload name (as sent to the API) -> Parquet table, in the order the records are packed
+BUNDLE_TABLES = {
+    'current_app': 'application_test.parquet',
+    'bureau': 'bureau.parquet',
+    'bureau_balance': 'bureau_balance.parquet',
+    'previous_application': 'previous_application.parquet',
+    'POS_CASH_balance': 'POS_CASH_balance.parquet',
+    'installments_payments': 'installments_payments.parquet',
+    'credit_card_balance': 'credit_card_balance.parquet'
+}
+# Columns that only exist in the Parquet output for lookups and are not part of the API payload
+BUNDLE_DROPPED_COLUMNS = {'bureau_balance': ['SK_ID_CURR']}
+
+# --- Client feature store (optional, --features) ---
+# The aggregates of notebook_to_establish_ids_to_troubleshoot.ipynb (agg_numeric, count_categorical and the manual
+# bureau_balance features) computed once for every client and stored as one fixed-width row per client.
+FEATURE_STORE_FILENAME = 'client_features.parquet'
+FEATURE_CLIENTS_PER_BATCH = 50000 # clients aggregated at a time, bounds the memory used
+FEATURE_ROW_GROUP_SIZE = 2000 # small row groups sorted by SK_ID_CURR: a lookup reads one of them
+NUMERIC_AGGREGATIONS = ['count', 'mean', 'max', 'min', 'sum']
+# Parquet table -> feature name prefix, aggregated directly on SK_ID_CURR
+FEATURE_TABLES = {
+    'bureau.parquet': 'bureau',
+    'previous_application.parquet': 'previous_application',
+    'POS_CASH_balance.parquet': 'POS_CASH_balance',
+    'installments_payments.parquet': 'installments_payments',
+    'credit_card_balance.parquet': 'credit_card_balance'
+}
+STATUS_CATEGORIES = ['0', '1', '2', '3', '4', '5', 'C', 'X'] # raw bureau_balance STATUS values
+NON_DPD_STATUSES = ['C', 'X', '0']
+STATUS_DAYS_PAST_DUE = {'C': 0, 'X': 0, '0': 0, '1': 15, '2': 45, '3': 75, '4': 105, '5': 120}
+LONG_TERM_LOAN_YEARS = 5
 
 # --- Column and Partition Key definitions (Unchanged) ---
 REQUIRED_COLUMNS = {
@@ -71,66 +168,962 @@ REQUIRED_COLUMNS = {
 PARTITION_KEYS = {
     'application_test.csv': None,
     'bureau.csv': 'SK_ID_CURR',
-    'bureau_balance.csv': 'SK_ID_BUREAU',
+    'bureau_balance.csv': 'SK_ID_CURR', # joined on from bureau.csv, see JOINED_KEYS
     'previous_application.csv': 'SK_ID_CURR',
     'POS_CASH_balance.csv': 'SK_ID_CURR',
     'installments_payments.csv': 'SK_ID_CURR',
     'credit_card_balance.csv': 'SK_ID_CURR'
 }
 
-def create_parquet_files():
+def _cut_points(boundaries: np.ndarray, n_rows: int, target_size: int) -> np.ndarray:
     """
-    Reads large CSVs in chunks and writes them to partitioned Parquet format,
-    providing progress updates and handling high partition counts.
+    Picks cut positions near every multiple of target_size, snapped to the next key boundary
+    so that the rows of one key never straddle two row groups (or two files).
     """
-    if not os.path.exists(OUTPUT_PARQUET_DIR):
-        os.makedirs(OUTPUT_PARQUET_DIR)
-        print(f"Created output directory: {OUTPUT_PARQUET_DIR}")
+    targets = np.arange(target_size, n_rows, target_size)
+    positions = np.searchsorted(boundaries, targets)
+    positions = positions[positions < len(boundaries)]
+    cuts = np.unique(boundaries[positions])
+    return np.concatenate(([0], cuts[cuts > 0], [n_rows]))
+
+
+def write_sorted_table(runs, output_path: str, sort_key: str) -> pd.DataFrame:
+    """
+    Writes a table sorted by sort_key into a few large files with small row groups,
+    and persists the offset index next to them. Returns the index.
+    runs is either the whole table or an iterable of tables covering disjoint, increasing key ranges
+    (the memory-bounded mode), each sorted and written before the next one is read.
+    """
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.makedirs(output_path)
+    if isinstance(runs, pa.Table):
+        runs = [runs]
+
+    index_parts = []
+    writer = None
+    file_number, file_name, rows_in_file, row_group = -1, None, 0, 0
+    try:
+        for table in runs:
+            table = table.sort_by(sort_key)
+            keys = table.column(sort_key).to_numpy(zero_copy_only=False)
+            n_rows = len(keys)
+            # Position of the first row of every distinct key (the array is sorted)
+            key_starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if n_rows else np.array([], dtype=np.int64)
+
+            group_cuts = _cut_points(key_starts, n_rows, SORTED_ROW_GROUP_SIZE)
+            for group_start, group_end in zip(group_cuts[:-1], group_cuts[1:]):
+                if group_end == group_start:
+                    continue
+                # Files are rotated on row group boundaries, so a key never straddles two files
+                if writer is None or rows_in_file >= SORTED_ROWS_PER_FILE:
+                    if writer is not None:
+                        writer.close()
+                        print(f"  -> Wrote {file_name} ({rows_in_file} rows).")
+                    file_number += 1
+                    file_name = f"part-{file_number:05d}.parquet"
+                    writer = pq.ParquetWriter(os.path.join(output_path, file_name), table.schema)
+                    rows_in_file, row_group = 0, 0
+                writer.write_table(table.slice(group_start, group_end - group_start), row_group_size=group_end - group_start)
+
+                # Every key of this row group gets its (offset, length) inside the row group
+                starts = key_starts[(key_starts >= group_start) & (key_starts < group_end)]
+                ends = np.append(starts[1:], group_end)
+                index_parts.append(pd.DataFrame({
+                    sort_key: keys[starts],
+                    'file': file_name,
+                    'row_group': row_group,
+                    'row_start': starts - group_start,
+                    'row_count': ends - starts
+                }))
+                rows_in_file += group_end - group_start
+                row_group += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        print(f"  -> Wrote {file_name} ({rows_in_file} rows).")
+
+    index_df = pd.concat(index_parts, ignore_index=True) if index_parts else pd.DataFrame(columns=[sort_key, 'file', 'row_group', 'row_start', 'row_count'])
+    index_df.to_parquet(os.path.join(output_path, CLIENT_INDEX_FILENAME), engine='pyarrow', index=False)
+    print(f"  -> Wrote offset index for {len(index_df)} keys.")
+    return index_df
+
+
+def write_partition_manifest(output_path: str, partition_key: str, table_schema: pa.Schema | None = None) -> pd.DataFrame:
+    """
+    Walks a hive-partitioned table once, at build time, and persists its partition manifest next to it:
+    partition value, file path relative to the table folder, row count, size and the min/max of the
+    PARTITION_MANIFEST_STATS_COLUMNS the table has, read from the file footers. Returns the manifest.
+    The schema of the data files is kept in the manifest metadata, so readers need no footer to assemble an empty result,
+    and so is the registry schema of the table (partition key included), so readers restore its column order.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    rows = []
+    file_schema = None
+    for dirpath, _, files in sorted(os.walk(output_path)):
+        partition = os.path.basename(dirpath)
+        if not partition.startswith(f"{partition_key}="):
+            continue
+        value = int(partition.split('=', 1)[1])
+        for file_name in sorted(files):
+            path = os.path.join(dirpath, file_name)
+            metadata = pq.read_metadata(path)
+            if file_schema is None:
+                file_schema = metadata.schema.to_arrow_schema()
+            row = {partition_key: value, 'path': f"{partition}/{file_name}", 'num_rows': metadata.num_rows,
+                   'size_bytes': os.path.getsize(path)}
+            for column in PARTITION_MANIFEST_STATS_COLUMNS:
+                if column not in file_schema.names:
+                    continue
+                position = file_schema.get_field_index(column)
+                stats = [metadata.row_group(i).column(position).statistics for i in range(metadata.num_row_groups)]
+                stats = [s for s in stats if s is not None and s.has_min_max]
+                row[f"{column}_min"] = min((s.min for s in stats), default=None)
+                row[f"{column}_max"] = max((s.max for s in stats), default=None)
+            rows.append(row)
+
+    columns = [partition_key, 'path', 'num_rows', 'size_bytes']
+    if file_schema is not None:
+        columns += [f"{column}_{bound}" for column in PARTITION_MANIFEST_STATS_COLUMNS if column in file_schema.names
+                    for bound in ('min', 'max')]
+    manifest_df = pd.DataFrame(rows, columns=columns)
+    manifest_table = pa.Table.from_pandas(manifest_df, preserve_index=False)
+    if file_schema is not None:
+        metadata = {b'file_schema': file_schema.remove_metadata().serialize().to_pybytes()}
+        if table_schema is not None:
+            metadata[b'table_schema'] = table_schema.remove_metadata().serialize().to_pybytes()
+        manifest_table = manifest_table.replace_schema_metadata(metadata)
+    pq.write_table(manifest_table, os.path.join(output_path, PARTITION_MANIFEST_FILENAME))
+    print(f"  -> Wrote partition manifest for {manifest_df[partition_key].nunique()} partitions ({len(manifest_df)} files).")
+    return manifest_df
+
+
+# --- Joined keys ---
+# Tables that do not carry SK_ID_CURR get it joined on from their parent table, so they can be stored under the
+# same client-keyed layout as the others and read in a single lookup instead of a two-step one.
+# child file -> (parent file, key shared with the parent, key copied from the parent)
+JOINED_KEYS = {
+    'bureau_balance.csv': ('bureau.csv', 'SK_ID_BUREAU', 'SK_ID_CURR')
+}
+
+
+def load_key_map(parent_path: str, shared_key: str, copied_key: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the two key columns of the parent table and returns them sorted by shared_key,
+    ready for a vectorized searchsorted lookup (bureau.csv: 1.7M pairs, ~14 MB).
+    """
+    keys_df = pd.read_csv(parent_path, usecols=[shared_key, copied_key], dtype='int64')
+    keys_df = keys_df.drop_duplicates(shared_key).sort_values(shared_key)
+    return keys_df[shared_key].to_numpy(), keys_df[copied_key].to_numpy()
+
+
+def add_joined_key(table: pa.Table, schema: pa.Schema, key_map: tuple, shared_key: str, copied_key: str) -> pa.Table:
+    """
+    Adds copied_key to a chunk by looking its shared_key up in the parent table.
+    Rows without a parent are dropped: no client lookup could ever reach them.
+    """
+    parent_keys, parent_values = key_map
+    shared = table.column(shared_key).to_numpy()
+    positions = np.minimum(np.searchsorted(parent_keys, shared), len(parent_keys) - 1)
+    matched = parent_keys[positions] == shared if len(parent_keys) else np.zeros(len(shared), dtype=bool)
+    if not matched.all():
+        print(f"  -> Dropping {int((~matched).sum())} rows without a matching {shared_key} in the parent table.")
+    table = table.filter(pa.array(matched)).append_column(copied_key, pa.array(parent_values[positions[matched]]))
+    return enforce_schema(table, schema)
+
+
+# --- Schema registry ---
+# Every column gets an explicit, compact Arrow type that is enforced on every chunk, so the Parquet output
+# never depends on what pandas happened to infer for a given 500k-row chunk.
+#   - SK_ID_* keys                      -> int32 (the largest, SK_ID_BUREAU, is about 6.8 million; int32 holds 2.1 billion)
+#   - low-cardinality text columns      -> dictionary-encoded (pandas 'category' when read back)
+#   - 0/1 flags and small counters      -> int8, MONTHS_BALANCE -> int16
+#   - DAYS_*, CNT_*, NUM_*, SK_DPD*...  -> int32 (integer-valued in the source, often written as "12.0")
+#   - AMT_* monetary amounts            -> float64, float32 would lose the cents on amounts above ~100k
+#   - everything else (scores, ratios, normalized housing features) -> float32
+CATEGORY_TYPE = pa.dictionary(pa.int16(), pa.string())
+CATEGORICAL_COLUMNS = {
+    'CREDIT_ACTIVE', 'CREDIT_CURRENCY', 'CREDIT_TYPE', 'STATUS', 'WEEKDAY_APPR_PROCESS_START',
+    'FLAG_LAST_APPL_PER_CONTRACT', 'CHANNEL_TYPE', 'PRODUCT_COMBINATION', 'FLAG_OWN_CAR', 'FLAG_OWN_REALTY',
+    'OCCUPATION_TYPE', 'ORGANIZATION_TYPE', 'FONDKAPREMONT_MODE', 'HOUSETYPE_MODE', 'WALLSMATERIAL_MODE',
+    'EMERGENCYSTATE_MODE'
+}
+INT8_COLUMNS = {'HOUR_APPR_PROCESS_START', 'CNT_CHILDREN', 'REGION_RATING_CLIENT', 'REGION_RATING_CLIENT_W_CITY'}
+
+
+def column_type(column: str) -> pa.DataType:
+    """Returns the Arrow type a column is stored with."""
+    if column in CATEGORICAL_COLUMNS or column.startswith(('NAME_', 'CODE_')):
+        return CATEGORY_TYPE
+    if column.startswith('SK_ID_'):
+        return pa.int32()
+    if column in INT8_COLUMNS or column.startswith(('FLAG_', 'NFLAG_', 'REG_', 'LIVE_')):
+        return pa.int8()
+    if column == 'MONTHS_BALANCE':
+        return pa.int16()
+    if (column.startswith(('DAYS_', 'CNT_', 'NUM_', 'SK_DPD', 'AMT_REQ_CREDIT_BUREAU_'))
+            or column.endswith('_CNT_SOCIAL_CIRCLE') or column == 'SELLERPLACE_AREA'):
+        return pa.int32()
+    if column.startswith('AMT_'):
+        return pa.float64()
+    return pa.float32()
+
+
+def table_schema(filename: str) -> pa.Schema:
+    """
+    Returns the schema a table is written with. Tables that keep every source column
+    (REQUIRED_COLUMNS is None) take their column list from the CSV header.
+    """
+    columns = REQUIRED_COLUMNS[filename]
+    if columns is None:
+        columns = pd.read_csv(os.path.join(SOURCE_DATA_DIR, filename), nrows=0).columns.tolist()
+    if filename in JOINED_KEYS:
+        columns = [JOINED_KEYS[filename][2]] + columns
+    return pa.schema([(column, column_type(column)) for column in columns])
+
+
+def enforce_schema(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Casts a chunk to the registry schema. Casts are safe: a fractional value in an integer column
+    or an out-of-range value raises instead of being silently truncated.
+    """
+    columns = []
+    for field in schema:
+        column = table.column(field.name)
+        if column.null_count == len(column):
+            # An all-empty chunk is typed as double by pandas (or null by Arrow), whatever the column holds
+            columns.append(pa.nulls(len(column), type=field.type))
+        else:
+            columns.append(column.cast(field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _csv_read_types(schema: pa.Schema) -> dict:
+    """
+    Types the Arrow CSV reader parses each column as before enforce_schema casts it:
+    integers are written like "12.0" in the source files, so they are parsed as float64 first.
+    """
+    read_types = {}
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            read_types[field.name] = pa.string()
+        elif pa.types.is_integer(field.type):
+            read_types[field.name] = pa.float64()
+        else:
+            read_types[field.name] = field.type
+    return read_types
+
+
+def iter_csv_chunks(source_path: str, schema: pa.Schema, engine: str, chunk_size: int, skip_rows: int = 0,
+                    block_size: int = ARROW_BLOCK_SIZE):
+    """
+    Yields the CSV as a sequence of Arrow tables that follow the registry schema, either through pandas
+    (read_csv + from_pandas) or through Arrow's own incremental CSV reader, which skips the pandas round trip.
+    skip_rows data rows are skipped without being converted (used to resume a half-written table).
+    """
+    if engine == 'arrow':
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=schema.names,
+            column_types=_csv_read_types(schema),
+            strings_can_be_null=True # empty fields are NaN for pandas, keep them null here too
+        )
+        read_options = pa_csv.ReadOptions(block_size=block_size, skip_rows_after_names=skip_rows)
+        with pa_csv.open_csv(source_path, read_options=read_options, convert_options=convert_options) as reader:
+            for batch in reader:
+                yield enforce_schema(pa.Table.from_batches([batch]), schema)
+    else:
+        # Text columns are read as str, otherwise a chunk holding only '0'/'1' STATUS values would come back as int64
+        text_dtypes = {field.name: str for field in schema if pa.types.is_dictionary(field.type)}
+        csv_reader = pd.read_csv(source_path, usecols=schema.names, dtype=text_dtypes, chunksize=chunk_size, low_memory=False,
+                                 skiprows=range(1, skip_rows + 1) if skip_rows else None)
+        for chunk_df in csv_reader:
+            yield enforce_schema(pa.Table.from_pandas(chunk_df, preserve_index=False), schema)
+
+
+# --- Memory-bounded mode ---
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No /proc (macOS): fall back to the high-water mark, which getrusage reports in bytes there
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def track_peak_rss(stats: dict) -> threading.Event:
+    """
+    Samples the RSS every RSS_SAMPLE_INTERVAL seconds in a background thread and keeps the highest value in
+    stats['peak_rss']. Setting the returned event stops the sampling.
+    """
+    stop = threading.Event()
+    stats['peak_rss'] = current_rss_bytes()
+
+    def sample():
+        while not stop.wait(RSS_SAMPLE_INTERVAL):
+            stats['peak_rss'] = max(stats['peak_rss'], current_rss_bytes())
+
+    threading.Thread(target=sample, daemon=True).start()
+    return stop
+
+
+def estimate_row_size(source_path: str, schema: pa.Schema) -> tuple[float, float]:
+    """
+    Parses the first SIZING_SAMPLE_ROWS rows of the CSV and returns (CSV bytes per row, Arrow bytes per row)
+    for the columns of schema.
+    """
+    with open(source_path, 'rb') as f:
+        header = f.readline()
+        sample = b''.join(itertools.islice(f, SIZING_SAMPLE_ROWS))
+    if not sample:
+        return float(len(header) or 1), 1.0
+    convert_options = pa_csv.ConvertOptions(include_columns=schema.names, column_types=_csv_read_types(schema),
+                                            strings_can_be_null=True)
+    table = enforce_schema(pa_csv.read_csv(pa.BufferReader(header + sample), convert_options=convert_options), schema)
+    return len(sample) / table.num_rows, max(table.nbytes / table.num_rows, 1.0)
+
+
+def plan_memory_budget(source_path: str, schema: pa.Schema, engine: str, memory_budget_mb: int) -> dict:
+    """
+    Turns a memory budget into chunk and run sizes for one table: rows per pandas chunk, bytes per Arrow CSV block,
+    and the number of on-disk runs the sorted/bucketed layouts spill the table to.
+    """
+    csv_row_bytes, arrow_row_bytes = estimate_row_size(source_path, schema)
+    budget = memory_budget_mb * 1024 * 1024
+    overhead = PANDAS_ROW_OVERHEAD if engine == 'pandas' else 1
+    chunk_rows = max(1000, int(budget * CHUNK_BUDGET_SHARE / (arrow_row_bytes * overhead)))
+    run_rows = max(1000, int(budget * RUN_BUDGET_SHARE / arrow_row_bytes))
+    estimated_rows = int(os.path.getsize(source_path) / csv_row_bytes) + 1
+    return {
+        'chunk_rows': chunk_rows,
+        'block_size': max(1024 * 1024, int(chunk_rows * csv_row_bytes)),
+        'runs': max(1, -(-estimated_rows // run_rows)),
+        'estimated_rows': estimated_rows
+    }
+
+
+def spill_runs(chunks, spill_path: str, run_key: str, run_of, run_count: int) -> dict:
+    """
+    Distributes the chunks over run_count on-disk runs (run_of maps an array of run_key values to run numbers),
+    so that a table larger than the memory budget can then be sorted one run at a time.
+    Returns {run number: run file} for the runs that received rows.
+    """
+    if os.path.exists(spill_path):
+        shutil.rmtree(spill_path)
+    os.makedirs(spill_path)
+
+    writers = {}
+    try:
+        for chunk in chunks:
+            runs = run_of(chunk.column(run_key).to_numpy(zero_copy_only=False))
+            order = np.argsort(runs, kind='stable')
+            chunk = chunk.take(order)
+            run_starts = np.searchsorted(runs[order], np.arange(run_count + 1))
+            for run in np.flatnonzero(np.diff(run_starts)):
+                if run not in writers:
+                    writers[run] = pq.ParquetWriter(os.path.join(spill_path, f"run-{run:05d}.parquet"), chunk.schema)
+                writers[run].write_table(chunk.slice(run_starts[run], run_starts[run + 1] - run_starts[run]))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {int(run): os.path.join(spill_path, f"run-{run:05d}.parquet") for run in sorted(writers)}
+
+
+# --- Build manifest ---
+# One JSON file per table (so parallel workers never write the same file), recording the source checksum,
+# the options the output was built with, the schema, the committed chunks and the output files.
+
+def _manifest_path(filename: str) -> str:
+    return os.path.join(OUTPUT_PARQUET_DIR, MANIFEST_DIRNAME, filename.replace('.csv', '.json'))
+
+
+def load_table_manifest(filename: str) -> dict:
+    """Returns the manifest entry of a table, or an empty dict if it was never built."""
+    path = _manifest_path(filename)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_table_manifest(filename: str, entry: dict):
+    """Writes the manifest entry through a temporary file so a crash never leaves it half-written."""
+    path = _manifest_path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(entry, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def file_fingerprint(path: str, previous_fingerprint: dict) -> dict:
+    """
+    Size, modification time and SHA-256 of a source file. Hashing a 700 MB CSV takes a few seconds,
+    so the previous checksum is reused when the size and modification time have not changed.
+    """
+    stat = os.stat(path)
+    fingerprint = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+    if previous_fingerprint.get('size') == stat.st_size and previous_fingerprint.get('mtime') == stat.st_mtime:
+        fingerprint['sha256'] = previous_fingerprint['sha256']
+        return fingerprint
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+            digest.update(block)
+    fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def _swap_into_place(staging_path: str, output_path: str):
+    """Replaces the published output with the staging copy using renames only."""
+    if os.path.isdir(staging_path):
+        old_path = output_path + '.old'
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        if os.path.exists(output_path):
+            os.rename(output_path, old_path)
+        os.rename(staging_path, output_path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+    else:
+        if os.path.isdir(output_path):
+            shutil.rmtree(output_path)
+        os.replace(staging_path, output_path)
 
-    chunk_size = 500000
+
+def _remove_uncommitted_chunks(staging_path: str, committed_chunks: int):
+    """Deletes files left behind by a chunk that was being written when the previous run stopped."""
+    for dirpath, _, files in os.walk(staging_path):
+        for file_name in files:
+            if file_name.startswith('chunk-') and int(file_name.split('-')[1]) >= committed_chunks:
+                os.remove(os.path.join(dirpath, file_name))
+
+
+def _list_output_files(output_path: str) -> list:
+    if os.path.isfile(output_path):
+        return [os.path.basename(output_path)]
+    return sorted(os.path.relpath(os.path.join(dirpath, f), output_path)
+                  for dirpath, _, files in os.walk(output_path) for f in files)
+
+
+def convert_table(filename: str, layout_mode: str = LAYOUT_MODE, engine: str = CONVERSION_ENGINE, force: bool = False,
+                  bucket_count: int = BUCKET_COUNT, memory_budget_mb: int = MEMORY_BUDGET_MB) -> dict:
+    """
+    Converts one source CSV into Parquet and returns its statistics (rows, seconds, peak RSS, status).
+    Runs in a worker process when several tables are converted in parallel, so every option is passed explicitly.
+
+    The table is skipped when its manifest says it was already built from the same source with the same options,
+    resumed at the last committed chunk when a previous run stopped half-way, and otherwise rebuilt in a staging
+    folder that only replaces the published output once it is complete.
+    With a memory budget the chunk sizes follow the measured row width and the sorted/bucketed layouts are
+    built from on-disk runs (see plan_memory_budget and spill_runs).
+    """
+    chunk_size = CHUNK_SIZE
+    block_size = ARROW_BLOCK_SIZE
     # A generous limit high enough for our largest file (~31k partitions)
     partition_limit = 40000 
 
-    for filename, cols_to_read in REQUIRED_COLUMNS.items():
-        try:
-            source_path = os.path.join(SOURCE_DATA_DIR, filename)
-            partition_key = PARTITION_KEYS.get(filename)
-            output_path = os.path.join(OUTPUT_PARQUET_DIR, filename.replace('.csv', '.parquet'))
-            
-            print(f"\n--- Processing {filename} ---")
+    start_time = time.perf_counter()
+    rows_written = 0
+    rss_stats = {}
+    stop_rss_sampling = track_peak_rss(rss_stats)
+    try:
+        source_path = os.path.join(SOURCE_DATA_DIR, filename)
+        partition_key = PARTITION_KEYS.get(filename)
+        output_path = os.path.join(OUTPUT_PARQUET_DIR, filename.replace('.csv', '.parquet'))
+        staging_path = output_path + '.staging'
+        
+        print(f"\n--- Processing {filename} ({engine} engine) ---")
 
-            if partition_key:
-                print(f"Reading {filename} in chunks of {chunk_size} rows...")
-                
-                csv_reader = pd.read_csv(source_path, usecols=cols_to_read, chunksize=chunk_size, low_memory=False)
-                
-                for i, chunk_df in enumerate(csv_reader):
-                    print(f"  -> Processing chunk {i+1}...")
-                    
-                    table = pa.Table.from_pandas(chunk_df, preserve_index=False)
-                    
-                    # --- THIS IS THE KEY COMBINED SOLUTION ---
-                    pq.write_to_dataset(
-                        table,
-                        root_path=output_path,
-                        partition_cols=[partition_key],
-                        max_partitions=partition_limit, # Add the limit override back in
-                        use_legacy_dataset=False # Use the modern, more robust dataset writer
-                    )
-                    # --- END OF SOLUTION ---
-
-                print(f"Finished processing all chunks for {filename}.")
+        previous_entry = {} if force else load_table_manifest(filename)
+        schema = table_schema(filename)
+        read_schema = schema
+        key_map = None
+        depends_on = {}
+        if filename in JOINED_KEYS:
+            parent_filename, shared_key, copied_key = JOINED_KEYS[filename]
+            # The copied key is not in the source CSV, it is joined on after reading
+            read_schema = schema.remove(schema.get_field_index(copied_key))
+            parent_path = os.path.join(SOURCE_DATA_DIR, parent_filename)
+            depends_on[parent_filename] = file_fingerprint(parent_path, previous_entry.get('depends_on', {}).get(parent_filename, {}))
+
+        plan = None
+        if memory_budget_mb:
+            plan = plan_memory_budget(source_path, read_schema, engine, memory_budget_mb)
+            chunk_size, block_size = plan['chunk_rows'], plan['block_size']
+            print(f"Memory budget {memory_budget_mb} MB: {chunk_size} rows per chunk, {block_size // 1024} KB CSV blocks, "
+                  f"~{plan['estimated_rows']} rows in {plan['runs']} runs.")
+
+        # The chunk size is not a build option: it changes with the budget, not the output (resume skips source rows)
+        build_options = {'layout': layout_mode if partition_key else 'single', 'engine': engine,
+                         'partition_key': partition_key}
+        if partition_key and layout_mode == 'bucketed':
+            build_options['buckets'] = bucket_count
+        entry = {
+            'source': file_fingerprint(source_path, previous_entry.get('source', {})),
+            'depends_on': depends_on,
+            'options': build_options,
+            'status': 'in_progress',
+            'schema': {field.name: str(field.type) for field in schema},
+            'completed_chunks': [],
+            'output_files': []
+        }
+        same_build = (previous_entry.get('source', {}).get('sha256') == entry['source']['sha256']
+                      and {name: dep['sha256'] for name, dep in previous_entry.get('depends_on', {}).items()}
+                          == {name: dep['sha256'] for name, dep in depends_on.items()}
+                      and previous_entry.get('options') == build_options
+                      and previous_entry.get('schema') == entry['schema'])
+
+        if same_build and previous_entry.get('status') == 'complete' and os.path.exists(output_path):
+            print(f"{filename} is unchanged since the last build, skipping.")
+            return {'filename': filename, 'rows': 0, 'seconds': time.perf_counter() - start_time,
+                    'peak_rss_mb': rss_stats['peak_rss'] / (1024 * 1024), 'status': 'skipped'}
+
+        if filename in JOINED_KEYS:
+            key_map = load_key_map(parent_path, shared_key, copied_key)
+            print(f"Loaded {len(key_map[0])} {shared_key} -> {copied_key} pairs from {parent_filename}.")
+
+        if partition_key and layout_mode in ('sorted', 'bucketed') and plan:
+            # Bounded memory: spill the chunks to runs that each fit the budget, then sort and write one run at a time
+            print(f"Spilling {filename} to runs for the {layout_mode} layout...")
+            chunks = iter_csv_chunks(source_path, read_schema, engine, chunk_size, block_size=block_size)
+            if key_map:
+                chunks = (add_joined_key(chunk, schema, key_map, shared_key, copied_key) for chunk in chunks)
+            spill_path = staging_path + '.spill'
+            if layout_mode == 'bucketed':
+                run_files = spill_runs(chunks, spill_path, partition_key, lambda keys: bucket_of(keys, bucket_count), bucket_count)
+                write_bucketed_table(run_files if run_files else schema.empty_table(), staging_path, partition_key, bucket_count)
+            else:
+                # Equal-width key ranges, so the runs come out in key order
+                if key_map:
+                    key_min, key_max = int(key_map[1].min()), int(key_map[1].max())
+                else:
+                    key_schema = pa.schema([schema.field(partition_key)])
+                    key_chunks = [(pc.min(chunk.column(0)).as_py(), pc.max(chunk.column(0)).as_py())
+                                  for chunk in iter_csv_chunks(source_path, key_schema, engine, chunk_size, block_size=block_size)
+                                  if chunk.num_rows]
+                    key_min = min((low for low, _ in key_chunks), default=0)
+                    key_max = max((high for _, high in key_chunks), default=0)
+                run_count, key_span = plan['runs'], key_max - key_min + 1
+                run_files = spill_runs(chunks, spill_path, partition_key,
+                                       lambda keys: (keys.astype(np.int64) - key_min) * run_count // key_span, run_count)
+                write_sorted_table((pq.read_table(run_files[run]) for run in sorted(run_files)), staging_path, partition_key)
+            rows_written = sum(pq.ParquetFile(path).metadata.num_rows for path in run_files.values())
+            shutil.rmtree(spill_path)
+            print(f"Finished writing {layout_mode} layout for {filename}.")
+        elif partition_key and layout_mode in ('sorted', 'bucketed'):
+            # The global sort cannot be resumed chunk by chunk, the table is rebuilt in one go
+            print(f"Reading {filename} in chunks for the {layout_mode} layout...")
+            table = pa.concat_tables(list(iter_csv_chunks(source_path, read_schema, engine, chunk_size)))
+            if key_map:
+                table = add_joined_key(table, schema, key_map, shared_key, copied_key)
+            rows_written = table.num_rows
+            if layout_mode == 'bucketed':
+                write_bucketed_table(table, staging_path, partition_key, bucket_count)
             else:
-                print(f"Reading full file for {filename}...")
-                df = pd.read_csv(source_path, usecols=cols_to_read)
-                df.to_parquet(output_path, engine='pyarrow', index=False)
-                print(f"Successfully created single parquet file for {filename}")
+                write_sorted_table(table, staging_path, partition_key)
+            print(f"Finished writing {layout_mode} layout for {filename}.")
+        elif partition_key:
+            resumable = same_build and previous_entry.get('status') == 'in_progress' and os.path.exists(staging_path)
+            if resumable:
+                entry['completed_chunks'] = previous_entry['completed_chunks']
+                _remove_uncommitted_chunks(staging_path, len(entry['completed_chunks']))
+                print(f"Resuming {filename} after {len(entry['completed_chunks'])} committed chunks...")
+            elif os.path.exists(staging_path):
+                shutil.rmtree(staging_path)
+            save_table_manifest(filename, entry)
+
+            skip_rows = sum(chunk['rows'] for chunk in entry['completed_chunks'])
+            print(f"Reading {filename} in chunks...")
+            
+            chunks = iter_csv_chunks(source_path, read_schema, engine, chunk_size, skip_rows=skip_rows, block_size=block_size)
+            for i, source_table in enumerate(chunks, start=len(entry['completed_chunks'])):
+                print(f"  -> Processing chunk {i+1} of {filename}...")
+                table = add_joined_key(source_table, schema, key_map, shared_key, copied_key) if key_map else source_table
+                
+                # --- THIS IS THE KEY COMBINED SOLUTION ---
+                pq.write_to_dataset(
+                    table,
+                    root_path=staging_path,
+                    partition_cols=[partition_key],
+                    max_partitions=partition_limit, # Add the limit override back in
+                    basename_template=f"chunk-{i:05d}-{{i}}.parquet", # lets a resumed run find the files of an uncommitted chunk
+                    use_legacy_dataset=False, # Use the modern, more robust dataset writer
+                    # Under a budget, keep fewer partition files (and their write buffers) open at once
+                    **({'max_open_files': BOUNDED_MAX_OPEN_FILES} if plan else {})
+                )
+                # --- END OF SOLUTION ---
+                rows_written += table.num_rows
+
+                # Commit the chunk: a rerun resumes right after it ('rows' counts source rows, used to skip them)
+                entry['completed_chunks'].append({'chunk': i, 'rows': source_table.num_rows, 'rows_written': table.num_rows})
+                save_table_manifest(filename, entry)
+
+            print(f"Finished processing all chunks for {filename}.")
+            write_partition_manifest(staging_path, partition_key, schema)
+        else:
+            print(f"Reading full file for {filename}...")
+            # Chunks are appended to the file as they are read, so only one is held in memory
+            with pq.ParquetWriter(staging_path, schema) as writer:
+                for table in iter_csv_chunks(source_path, schema, engine, chunk_size, block_size=block_size):
+                    writer.write_table(table)
+                    rows_written += table.num_rows
+            print(f"Successfully created single parquet file for {filename}")
+
+        _swap_into_place(staging_path, output_path)
+        entry['status'] = 'complete'
+        entry['output_files'] = _list_output_files(output_path)
+        save_table_manifest(filename, entry)
+        status = 'ok'
+
+    except Exception as e:
+        print(f"  -> ERROR processing {filename}: {e}")
+        traceback.print_exc()
+        status = f"error: {e}"
+    finally:
+        stop_rss_sampling.set()
 
-        except Exception as e:
-            print(f"  -> ERROR processing {filename}: {e}")
-            traceback.print_exc()
+    seconds = time.perf_counter() - start_time
+    return {'filename': filename, 'rows': rows_written, 'seconds': seconds,
+            'peak_rss_mb': rss_stats['peak_rss'] / (1024 * 1024), 'status': status}
+
+
+def plain_columns(table: pa.Table) -> pa.Table:
+    """
+    Decodes dictionary columns: a serialized record batch carries no dictionaries,
+    and the hive layout hands the partition column back dictionary-encoded. Also used by benchmark_parquet.py.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table
+
+
+def build_client_bundles() -> int:
+    """
+    Packs each client's rows from all seven Parquet tables into one compressed record of BUNDLE_DATA_FILENAME.
+    A record is the concatenation, in BUNDLE_TABLES order, of length-prefixed serialized record batches.
+    The schemas are stored once, in the metadata of the offset index (SK_ID_CURR, offset, length, raw_length):
+    the schema of the batches and the registry schema they are cast back to when read (dictionary columns).
+    Returns the number of clients written.
+    """
+    output_path = os.path.join(OUTPUT_PARQUET_DIR, BUNDLE_DIRNAME)
+    staging_path = output_path + '.staging'
+    if os.path.exists(staging_path):
+        shutil.rmtree(staging_path)
+    os.makedirs(staging_path)
+
+    print(f"\n--- Building client bundles in {output_path} ---")
+    app_path = os.path.join(OUTPUT_PARQUET_DIR, BUNDLE_TABLES['current_app'])
+    client_ids = np.unique(pq.read_table(app_path, columns=['SK_ID_CURR']).column('SK_ID_CURR').to_numpy())
+
+    schemas, table_schemas = {}, {}
+    index_parts = []
+    offset = 0
+    with open(os.path.join(staging_path, BUNDLE_DATA_FILENAME), 'wb') as out:
+        for batch_start in range(0, len(client_ids), BUNDLE_CLIENTS_PER_BATCH):
+            batch_ids = client_ids[batch_start:batch_start + BUNDLE_CLIENTS_PER_BATCH]
+            print(f"  -> Packing clients {batch_start + 1} to {batch_start + len(batch_ids)} of {len(client_ids)}...")
+            id_range = [('SK_ID_CURR', '>=', int(batch_ids[0])), ('SK_ID_CURR', '<=', int(batch_ids[-1]))]
+
+            tables, bounds = {}, {}
+            for name, table_file in BUNDLE_TABLES.items():
+                table = plain_columns(pq.read_table(os.path.join(OUTPUT_PARQUET_DIR, table_file), filters=id_range))
+                # The hive layout hands the partition key back last: restore the registry's column order
+                registry_schema = table_schema(table_file.replace('.parquet', '.csv'))
+                table = table.select(registry_schema.names)
+                keys = table.column('SK_ID_CURR').to_numpy()
+                order = np.argsort(keys, kind='stable')
+                table, keys = table.take(order), keys[order]
+                # Rows of client batch_ids[j] are table[starts[j]:ends[j]]
+                bounds[name] = (np.searchsorted(keys, batch_ids, side='left'), np.searchsorted(keys, batch_ids, side='right'))
+                tables[name] = table.drop_columns(BUNDLE_DROPPED_COLUMNS.get(name, []))
+                schemas.setdefault(name, tables[name].schema)
+                table_schemas.setdefault(name, pa.schema([field for field in registry_schema if field.name in tables[name].schema.names]))
+
+            lengths, raw_lengths = [], []
+            for j in range(len(batch_ids)):
+                parts = []
+                for name, table in tables.items():
+                    start, end = bounds[name][0][j], bounds[name][1][j]
+                    batches = table.slice(start, end - start).combine_chunks().to_batches()
+                    batch = batches[0] if batches else pa.RecordBatch.from_pylist([], schema=schemas[name])
+                    payload = batch.serialize().to_pybytes()
+                    parts.append(len(payload).to_bytes(4, 'little') + payload)
+                raw = b''.join(parts)
+                record = pa.compress(raw, codec=BUNDLE_COMPRESSION, asbytes=True)
+                out.write(record)
+                lengths.append(len(record))
+                raw_lengths.append(len(raw))
+
+            lengths = np.array(lengths, dtype=np.int64)
+            index_parts.append(pd.DataFrame({
+                'SK_ID_CURR': batch_ids,
+                'offset': offset + np.concatenate(([0], np.cumsum(lengths)[:-1])),
+                'length': lengths,
+                'raw_length': raw_lengths
+            }))
+            offset += int(lengths.sum())
+
+    index_table = pa.Table.from_pandas(pd.concat(index_parts, ignore_index=True), preserve_index=False)
+    metadata = {f"schema:{name}".encode(): schema.serialize().to_pybytes() for name, schema in schemas.items()}
+    metadata.update({f"table_schema:{name}".encode(): schema.serialize().to_pybytes() for name, schema in table_schemas.items()})
+    pq.write_table(index_table.replace_schema_metadata(metadata), os.path.join(staging_path, BUNDLE_INDEX_FILENAME))
+
+    _swap_into_place(staging_path, output_path)
+    print(f"Wrote {len(client_ids)} client bundles ({offset / 1e6:.1f} MB, {offset / max(len(client_ids), 1) / 1e3:.1f} KB per client on average).")
+    return len(client_ids)
+
+
+def aggregate_numeric(df: pd.DataFrame, group_var: str, df_name: str) -> pd.DataFrame:
+    """
+    Vectorized agg_numeric of the notebook: count, mean, max, min and sum of every numeric column per group_var,
+    named <df_name>_<column>_<stat>. The other SK_ID_* columns are left out.
+    """
+    value_columns = [column for column in df.columns
+                     if column != group_var and 'SK_ID' not in column and pd.api.types.is_numeric_dtype(df[column])]
+    agg = df.groupby(group_var)[value_columns].agg(NUMERIC_AGGREGATIONS)
+    agg.columns = [f"{df_name}_{column}_{stat}" for column, stat in agg.columns]
+    return agg
+
+
+def count_categories(df: pd.DataFrame, group_var: str, df_name: str) -> pd.DataFrame:
+    """
+    Vectorized count_categorical of the notebook: for every value of every categorical column, the number of rows
+    of each group_var holding it (<df_name>_<column>_<value>_count) and their share of the group's rows (..._count_norm).
+    Every category of the column gets its pair of features, so the width does not depend on the rows at hand.
+    """
+    sizes = df.groupby(group_var).size()
+    parts = []
+    for column in df.columns:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        counts = df.groupby([group_var, column], observed=False).size().unstack(fill_value=0).reindex(sizes.index, fill_value=0)
+        counts.columns = [f"{df_name}_{column}_{value}_count" for value in counts.columns]
+        shares = counts.div(sizes, axis=0)
+        shares.columns = [f"{name}_norm" for name in counts.columns]
+        parts.extend([counts, shares])
+    return pd.concat(parts, axis=1) if parts else pd.DataFrame(index=sizes.index)
+
+
+def bureau_balance_features(bureau_balance: pd.DataFrame) -> pd.DataFrame:
+    """
+    The manual bureau_balance features of the notebook, one row per SK_ID_BUREAU: loan duration in months and
+    in years (long/short term), last known status, months spent in each status, months past due and mean days past due.
+    """
+    status = bureau_balance['STATUS']
+    by_loan = bureau_balance.groupby('SK_ID_BUREAU')
+    features = pd.DataFrame({
+        'SK_ID_CURR': by_loan['SK_ID_CURR'].first(),
+        'MONTHS_LOAN_DURATION': by_loan['MONTHS_BALANCE'].count()
+    })
+
+    # Last known status: the status of the most recent month of each loan
+    most_recent_first = bureau_balance.sort_values(['SK_ID_BUREAU', 'MONTHS_BALANCE'], ascending=[True, False])
+    last_status = most_recent_first.groupby('SK_ID_BUREAU', observed=False)['STATUS'].first().reindex(features.index)
+    for category in STATUS_CATEGORIES:
+        features[f"LAST_STATUS_{category}"] = (last_status == category).astype(np.int8)
+
+    months_per_status = bureau_balance.groupby(['SK_ID_BUREAU', 'STATUS'], observed=False).size().unstack(fill_value=0)
+    months_per_status = months_per_status.reindex(index=features.index, columns=STATUS_CATEGORIES, fill_value=0)
+    for category in STATUS_CATEGORIES:
+        features[f"STATUS_{category}_MONTHS"] = months_per_status[category]
+
+    features['DPD_FLAG'] = (~status.isin(NON_DPD_STATUSES)).groupby(bureau_balance['SK_ID_BUREAU']).sum()
+    features['MEAN_DAYS_PAST_DUE'] = status.astype(object).map(STATUS_DAYS_PAST_DUE).astype('float64').groupby(bureau_balance['SK_ID_BUREAU']).mean()
+    features['YEAR_LOAN_DURATION'] = (by_loan['MONTHS_BALANCE'].min() / -12).round(1)
+    features['LOAN_TYPE_Long Term'] = (features['YEAR_LOAN_DURATION'] >= LONG_TERM_LOAN_YEARS).astype(np.int8)
+    features['LOAN_TYPE_Short Term'] = 1 - features['LOAN_TYPE_Long Term']
+    return features.reset_index()
+
+
+def _read_feature_table(table_file: str, id_range: list, categories: dict) -> pd.DataFrame:
+    """Reads the rows of a client range from a Parquet table, with its text columns as fixed categoricals."""
+    df = plain_columns(pq.read_table(os.path.join(OUTPUT_PARQUET_DIR, table_file), filters=id_range)).to_pandas()
+    for column, values in categories.items():
+        df[column] = pd.Categorical(df[column], categories=values)
+    return df
+
+
+def _table_categories(table_file: str) -> dict:
+    """Distinct values of every text column of a Parquet table, read once so every batch has the same features."""
+    path = os.path.join(OUTPUT_PARQUET_DIR, table_file)
+    schema = pq.read_schema(path) if os.path.isfile(path) else pq.ParquetDataset(path).schema
+    categories = {}
+    for field in schema:
+        if field.name != 'SK_ID_CURR' and (pa.types.is_dictionary(field.type) or pa.types.is_string(field.type)):
+            values = plain_columns(pq.read_table(path, columns=[field.name])).column(0).unique().drop_null()
+            categories[field.name] = sorted(values.to_pylist())
+    return categories
+
+
+def build_feature_store() -> int:
+    """
+    Computes the per-client aggregates of the notebook for every client of application_test, in batches of
+    FEATURE_CLIENTS_PER_BATCH clients, and writes them as one float32 row per client sorted by SK_ID_CURR.
+    Clients without rows in a table get nulls for its features. Returns the number of clients written.
+    """
+    output_path = os.path.join(OUTPUT_PARQUET_DIR, FEATURE_STORE_FILENAME)
+    print(f"\n--- Building client feature store in {output_path} ---")
+    app_path = os.path.join(OUTPUT_PARQUET_DIR, 'application_test.parquet')
+    client_ids = np.unique(pq.read_table(app_path, columns=['SK_ID_CURR']).column('SK_ID_CURR').to_numpy())
+    if len(client_ids) == 0:
+        print("No clients in application_test: nothing to aggregate, the feature store is left as it is.")
+        return 0
+
+    table_files = list(FEATURE_TABLES) + ['bureau_balance.parquet']
+    categories = {table_file: _table_categories(table_file) for table_file in table_files}
+    categories['bureau_balance.parquet']['STATUS'] = STATUS_CATEGORIES
+
+    writer = None
+    try:
+        for batch_start in range(0, len(client_ids), FEATURE_CLIENTS_PER_BATCH):
+            batch_ids = client_ids[batch_start:batch_start + FEATURE_CLIENTS_PER_BATCH]
+            print(f"  -> Aggregating clients {batch_start + 1} to {batch_start + len(batch_ids)} of {len(client_ids)}...")
+            id_range = [('SK_ID_CURR', '>=', int(batch_ids[0])), ('SK_ID_CURR', '<=', int(batch_ids[-1]))]
+
+            parts = []
+            for table_file, df_name in FEATURE_TABLES.items():
+                df = _read_feature_table(table_file, id_range, categories[table_file])
+                parts.append(aggregate_numeric(df, 'SK_ID_CURR', df_name))
+                parts.append(count_categories(df, 'SK_ID_CURR', df_name))
+
+            # bureau_balance is aggregated per loan first, then per client (the notebook's 'client' features)
+            bureau_balance = _read_feature_table('bureau_balance.parquet', id_range, categories['bureau_balance.parquet'])
+            per_loan = pd.concat([
+                aggregate_numeric(bureau_balance, 'SK_ID_BUREAU', 'bureau_balance'),
+                count_categories(bureau_balance, 'SK_ID_BUREAU', 'bureau_balance')
+            ], axis=1)
+            per_loan['SK_ID_CURR'] = bureau_balance.groupby('SK_ID_BUREAU')['SK_ID_CURR'].first()
+            parts.append(aggregate_numeric(per_loan, 'SK_ID_CURR', 'client'))
+            parts.append(aggregate_numeric(bureau_balance_features(bureau_balance), 'SK_ID_CURR', 'client_bureau_balance'))
+
+            features = pd.concat([part.reindex(batch_ids) for part in parts], axis=1).astype('float32')
+            features.index.name = 'SK_ID_CURR'
+            table = pa.Table.from_pandas(features.reset_index(), preserve_index=False)
+            table = table.set_column(0, 'SK_ID_CURR', table.column(0).cast(pa.int32()))
+            if writer is None:
+                writer = pq.ParquetWriter(output_path + '.staging', table.schema, write_statistics=True)
+            writer.write_table(table, row_group_size=FEATURE_ROW_GROUP_SIZE)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    _swap_into_place(output_path + '.staging', output_path)
+    print(f"Wrote {len(client_ids)} clients x {table.num_columns - 1} features.")
+    return len(client_ids)
+
+
+def bucket_of(keys: np.ndarray, bucket_count: int) -> np.ndarray:
+    """
+    Knuth multiplicative hash of the keys, so consecutive ids spread evenly over the buckets.
+    utils.py computes the same hash for a single key.
+    """
+    hashed = (keys.astype(np.uint64) * np.uint64(2654435761)) % np.uint64(2**32)
+    return (hashed % np.uint64(bucket_count)).astype(np.int64)
+
+
+def _write_bucket_file(table: pa.Table, path: str, key_position: int):
+    """Writes one bucket, already sorted by its key, with small row groups, statistics and a page index."""
+    with pq.ParquetWriter(
+        path,
+        table.schema,
+        write_statistics=True,
+        write_page_index=True, # column/offset indexes for engines that prune pages
+        sorting_columns=[pq.SortingColumn(key_position)]
+        # Bloom filters on the ID columns cannot be written with pyarrow 16; the sort plus min/max
+        # statistics of small row groups give the reader the same one-row-group lookup.
+    ) as writer:
+        writer.write_table(table, row_group_size=BUCKETED_ROW_GROUP_SIZE)
+
+
+def write_bucketed_table(table, output_path: str, bucket_key: str, bucket_count: int = BUCKET_COUNT):
+    """
+    Writes a table as bucket_count files (bucket-00000.parquet ...), hashed on bucket_key and sorted by it inside
+    each file, and records the layout in BUCKET_LAYOUT_FILENAME for the readers.
+    table is either the whole table or, in the memory-bounded mode, {bucket: spilled run file} as returned by
+    spill_runs with bucket_of as the run function, each bucket then being sorted on its own.
+    """
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.makedirs(output_path)
+
+    rows_written = 0
+    if isinstance(table, pa.Table):
+        keys = table.column(bucket_key).to_numpy()
+        buckets = bucket_of(keys, bucket_count)
+        # One sort by (bucket, key) leaves every bucket contiguous and sorted
+        order = np.lexsort((keys, buckets))
+        table = table.take(order)
+        bucket_starts = np.searchsorted(buckets[order], np.arange(bucket_count + 1))
+
+        key_position = table.schema.get_field_index(bucket_key)
+        for bucket in range(bucket_count):
+            start, end = bucket_starts[bucket], bucket_starts[bucket + 1]
+            _write_bucket_file(table.slice(start, end - start), os.path.join(output_path, f"bucket-{bucket:05d}.parquet"), key_position)
+        rows_written = table.num_rows
+    else:
+        run_files = table
+        schema = pq.read_schema(next(iter(run_files.values())))
+        for bucket in range(bucket_count):
+            # Empty buckets still get their (empty) file, the reader opens the file of the key's bucket directly
+            bucket_table = pq.read_table(run_files[bucket]).sort_by(bucket_key) if bucket in run_files else schema.empty_table()
+            _write_bucket_file(bucket_table, os.path.join(output_path, f"bucket-{bucket:05d}.parquet"),
+                               bucket_table.schema.get_field_index(bucket_key))
+            rows_written += bucket_table.num_rows
+
+    with open(os.path.join(output_path, BUCKET_LAYOUT_FILENAME), 'w') as f:
+        json.dump({'key': bucket_key, 'buckets': bucket_count, 'hash': 'knuth_multiplicative'}, f)
+    print(f"  -> Wrote {bucket_count} buckets of about {rows_written // bucket_count} rows.")
+
+
+def create_parquet_files(layout_mode: str = LAYOUT_MODE, engine: str = CONVERSION_ENGINE, max_workers: int = MAX_WORKERS, force: bool = False,
+                         bucket_count: int = BUCKET_COUNT, memory_budget_mb: int = MEMORY_BUDGET_MB) -> list:
+    """
+    Reads large CSVs in chunks and writes them to partitioned Parquet format,
+    providing progress updates and handling high partition counts.
+    With max_workers > 1 the tables are converted in parallel in a process pool.
+    Unchanged tables are skipped unless force is set (see convert_table).
+    """
+    if not os.path.exists(OUTPUT_PARQUET_DIR):
+        os.makedirs(OUTPUT_PARQUET_DIR)
+        print(f"Created output directory: {OUTPUT_PARQUET_DIR}")
+
+    filenames = list(REQUIRED_COLUMNS.keys())
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(convert_table, filenames, [layout_mode] * len(filenames), [engine] * len(filenames),
+                                        [force] * len(filenames), [bucket_count] * len(filenames),
+                                        [memory_budget_mb] * len(filenames)))
+    else:
+        results = [convert_table(filename, layout_mode, engine, force, bucket_count, memory_budget_mb) for filename in filenames]
+
+    print("\n--- Conversion summary ---")
+    for result in results:
+        rows_per_second = result['rows'] / result['seconds'] if result['seconds'] > 0 else 0
+        print(f"{result['filename']:<28} {result['rows']:>12,} rows  {result['seconds']:>8.1f} s  {rows_per_second:>12,.0f} rows/s  {result['peak_rss_mb']:>8,.0f} MB peak RSS  {result['status']}")
+    return results
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert the source CSVs into Parquet for the dashboard.")
+    parser.add_argument('--layout', choices=['hive', 'sorted', 'bucketed'], default=LAYOUT_MODE, help="Output layout for the client-keyed tables.")
+    parser.add_argument('--engine', choices=['pandas', 'arrow'], default=CONVERSION_ENGINE, help="CSV reader used for the conversion.")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Number of tables converted in parallel.")
+    parser.add_argument('--buckets', type=int, default=BUCKET_COUNT, help="Number of hash buckets for the bucketed layout.")
+    parser.add_argument('--memory-budget', type=int, default=MEMORY_BUDGET_MB,
+                        help="Memory budget in MB per worker process (0: fixed chunk sizes and in-memory sorts).")
+    parser.add_argument('--force', action='store_true', help="Rebuild every table even if its manifest says it is up to date.")
+    parser.add_argument('--bundles', action='store_true', help="Also pack every client into the single-file bundle store.")
+    parser.add_argument('--features', action='store_true', help="Also compute the per-client aggregates of the feature store.")
+    args = parser.parse_args()
+
     print("--- Starting Data Pre-processing to Parquet (Final Chunked Version) ---")
-    create_parquet_files()
+    create_parquet_files(layout_mode=args.layout, engine=args.engine, max_workers=args.workers, force=args.force, bucket_count=args.buckets,
+                         memory_budget_mb=args.memory_budget)
+    if args.bundles:
+        build_client_bundles()
+    if args.features:
+        build_feature_store()
     print("\n--- Pre-processing Complete ---")
\ No newline at end of file
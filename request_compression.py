@@ -0,0 +1,86 @@
+"""
+Compression of the request bodies sent to the prediction API, and a record of every call.
+
+A body is produced piece by piece by its encoder (json_encoder.iter_payload) and written straight into the
+compressor, so the uncompressed body never exists in one piece: only its first REQUEST_COMPRESSION_MIN_BYTES are
+buffered, to send the bodies below that threshold as they are (for a few KB the compression framing and CPU
+cost more than the bytes saved on the network). gzip and zstd are pyarrow's codecs, so nothing is added to the
+requirements. The response is decompressed by requests itself (it advertises the codings urllib3 can decode).
+
+record_api_call prints every call (sent and uncompressed bytes, ratio, encode and request time) and keeps the last
+CALL_HISTORY ones for api_call_stats, to check that the compression time pays for itself against the API latency.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+import pyarrow as pa
+
+# --- Configuration ---
+REQUEST_COMPRESSION = os.environ.get("API_REQUEST_COMPRESSION", "none") # 'gzip', 'zstd' or 'none'
+REQUEST_COMPRESSION_MIN_BYTES = int(os.environ.get("API_REQUEST_COMPRESSION_MIN_KB", "8")) * 1024
+CONTENT_CODINGS = ('gzip', 'zstd') # also the Content-Encoding names of the codecs
+CALL_HISTORY = 100
+
+_calls = deque(maxlen=CALL_HISTORY)
+_calls_lock = threading.Lock()
+
+
+def compress_pieces(pieces, codec: str = REQUEST_COMPRESSION, min_bytes: int = REQUEST_COMPRESSION_MIN_BYTES) -> dict:
+    """
+    Streams the pieces (bytes) of a body through codec once they add up to min_bytes.
+    Returns {'body', 'content_encoding' (None when sent as is), 'raw_bytes', 'seconds'}.
+    """
+    if codec != 'none' and codec not in CONTENT_CODINGS:
+        raise ValueError(f"Unknown request compression '{codec}', expected 'none' or one of {CONTENT_CODINGS}.")
+    start = time.perf_counter()
+    buffered, raw_bytes = [], 0
+    sink = compressor = None
+    for piece in pieces:
+        raw_bytes += len(piece)
+        if compressor is not None:
+            compressor.write(piece)
+            continue
+        buffered.append(piece)
+        if codec != 'none' and raw_bytes >= min_bytes:
+            sink = pa.BufferOutputStream()
+            compressor = pa.CompressedOutputStream(sink, codec)
+            for buffered_piece in buffered:
+                compressor.write(buffered_piece)
+            buffered = None
+    if compressor is None:
+        body, content_encoding = b''.join(buffered), None
+    else:
+        compressor.close()
+        body, content_encoding = sink.getvalue().to_pybytes(), codec
+    return {'body': body, 'content_encoding': content_encoding, 'raw_bytes': raw_bytes, 'seconds': time.perf_counter() - start}
+
+
+def record_api_call(**call) -> dict:
+    """
+    Records one API call: payload_format, content_encoding, raw_bytes, sent_bytes, request_seconds, status, and
+    encode_seconds (the time the body took to encode and compress, when it was built: a cached body is reused).
+    Prints it and returns it with its compression ratio.
+    """
+    call['ratio'] = call['raw_bytes'] / call['sent_bytes'] if call['sent_bytes'] else 1.0
+    with _calls_lock:
+        _calls.append(call)
+    print(f"  API call ({call['payload_format']}, {call['content_encoding'] or 'identity'}): {call['sent_bytes'] / 1024:.1f} KB sent "
+          f"for {call['raw_bytes'] / 1024:.1f} KB (x{call['ratio']:.1f}), encoded in {call['encode_seconds'] * 1000:.1f} ms, "
+          f"request {call['request_seconds'] * 1000:.1f} ms, status {call.get('status')}")
+    return call
+
+
+def api_call_stats() -> dict:
+    """Totals and means over the last CALL_HISTORY calls, plus the calls themselves (oldest first)."""
+    with _calls_lock:
+        calls = list(_calls)
+    count = len(calls) or 1
+    raw_bytes = sum(call['raw_bytes'] for call in calls)
+    sent_bytes = sum(call['sent_bytes'] for call in calls)
+    return {'calls': len(calls), 'raw_bytes': raw_bytes, 'sent_bytes': sent_bytes,
+            'ratio': raw_bytes / sent_bytes if sent_bytes else 1.0,
+            'mean_encode_ms': sum(call['encode_seconds'] for call in calls) * 1000 / count,
+            'mean_request_ms': sum(call['request_seconds'] for call in calls) * 1000 / count,
+            'history': calls}
@@ -0,0 +1,118 @@
+"""
+In-memory cache of per-client results, bounded by the memory the entries actually take rather than by their count.
+
+Every entry is sized when it is stored (deep size of the payload and its encoded body, pandas' deep memory usage
+for DataFrames), and entries are evicted once the total exceeds the byte budget: least recently used first ('lru'),
+or least frequently used first with the oldest access breaking ties ('lfu'). Entries older than the TTL are
+dropped on access. stats() reports the size, hit rate, evictions and expirations.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+EVICTION_POLICIES = ('lru', 'lfu')
+
+
+def deep_sizeof(obj, seen: set | None = None) -> int:
+    """
+    Memory taken by an object and everything it references: containers are walked, DataFrames and arrays use
+    their own (deep) accounting. Objects shared between several places (e.g. the column names repeated as keys of
+    every record) are counted once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes + sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type): # plain objects, e.g. a ClientPayload
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class ClientResultCache:
+    """Thread-safe key -> result cache bounded to max_bytes, with LRU or LFU eviction and a TTL."""
+
+    def __init__(self, max_bytes: int, policy: str = 'lru', ttl_seconds: float = 0):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}', expected one of {EVICTION_POLICIES}.")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.ttl_seconds = ttl_seconds # 0: entries never expire
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> [value, size, stored at, access count], least recently used first
+        self._total_bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'rejected': 0}
+
+    def get(self, key):
+        """Returns the cached value, or None when it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._remove(key)
+                self.counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            entry[3] += 1
+            self.counters['hits'] += 1
+            return entry[0]
+
+    def __contains__(self, key) -> bool:
+        """Whether a fresh entry is cached, without counting a lookup or touching its recency."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not (self.ttl_seconds and time.monotonic() - entry[2] > self.ttl_seconds)
+
+    def put(self, key, value) -> int:
+        """Stores a value, evicts down to the budget, and returns its size (values larger than the budget are not kept)."""
+        size = deep_sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                self.counters['rejected'] += 1
+                return size
+            self._entries[key] = [value, size, time.monotonic(), 1]
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                self._remove(self._victim())
+                self.counters['evictions'] += 1
+        return size
+
+    def _victim(self):
+        # Called with the lock held; the OrderedDict is in recency order, so min() keeps the LRU one among ties
+        if self.policy == 'lfu':
+            return min(self._entries, key=lambda key: self._entries[key][3])
+        return next(iter(self._entries))
+
+    def _remove(self, key):
+        self._total_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        """Counters plus the number of entries, their total size and the hit rate."""
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {**self.counters, 'entries': len(self._entries), 'size_mb': self._total_bytes / (1024 * 1024),
+                    'budget_mb': self.max_bytes / (1024 * 1024), 'hit_rate': self.counters['hits'] / lookups if lookups else 0.0}
@@ -0,0 +1,262 @@
+"""
+Storage backends for the dashboard's data, chosen from the data root alone:
+- a local folder (relative or absolute path, or file://...),
+- AWS S3 (s3://bucket/prefix),
+- an S3-compatible server such as MinIO or LocalStack (s3://bucket/prefix with S3_ENDPOINT_URL set).
+
+Every backend is exposed as a pyarrow filesystem, so datasets, Parquet readers and ranged reads use it unchanged.
+Between the readers and the source it:
+- reads ahead: a read smaller than READ_AHEAD_BYTES fetches READ_AHEAD_BYTES, and the following reads that fall
+  in that window are served from memory (footer, then the column chunks of a small file: one request). Under the
+  disk cache (utils.get_filesystem) the read-ahead is off: the cache already widens every miss to whole
+  BLOCK_SIZE blocks, so the blocks are what coalesces the small reads sent to S3,
+- merges nearby byte ranges into single requests: read_ranges for the ranges the code asks for itself, and the
+  CacheOptions of the Parquet scans (parquet_scan_options) for the column chunks pyarrow asks for,
+- counts requests (reads, file info, listings) and bytes per backend, so the same code can be benchmarked on
+  local files and tuned for S3 (storage_stats).
+"""
+
+import io
+import os
+import threading
+from urllib.parse import urlparse
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+# --- Configuration ---
+# S3-compatible server (e.g. http://localhost:9000 for a local MinIO); unset means AWS S3
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_REGION = os.environ.get("AWS_REGION", os.environ.get("AWS_DEFAULT_REGION"))
+READ_AHEAD_BYTES = int(os.environ.get("STORAGE_READ_AHEAD_KB", "256")) * 1024
+COALESCE_HOLE_BYTES = int(os.environ.get("STORAGE_COALESCE_HOLE_KB", "64")) * 1024 # gaps up to this size are read through
+COALESCE_MAX_BYTES = int(os.environ.get("STORAGE_COALESCE_MAX_MB", "32")) * 1024 * 1024 # upper bound of one merged request
+
+# Counters per backend name, shared by every filesystem of that backend
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def backend_name(root: str) -> str:
+    """'local', 's3' or 's3-compatible'."""
+    scheme = urlparse(root).scheme
+    if scheme in ('', 'file') or len(scheme) == 1: # a Windows drive letter is not a scheme
+        return 'local'
+    if scheme == 's3':
+        return 's3-compatible' if S3_ENDPOINT_URL else 's3'
+    raise ValueError(f"Unsupported data root '{root}': expected a local path or an s3:// URI.")
+
+
+def source_filesystem(root: str) -> tuple[pafs.FileSystem, str]:
+    """The raw pyarrow filesystem of a data root, and the base path of the root inside it."""
+    name = backend_name(root)
+    if name == 'local':
+        path = urlparse(root).path if root.startswith('file://') else root
+        return pafs.LocalFileSystem(), os.path.abspath(path)
+    parsed = urlparse(root)
+    base_path = f"{parsed.netloc}{parsed.path}".rstrip('/')
+    if name == 's3-compatible':
+        endpoint = urlparse(S3_ENDPOINT_URL)
+        return pafs.S3FileSystem(endpoint_override=endpoint.netloc, scheme=endpoint.scheme or 'http',
+                                 region=S3_REGION or 'us-east-1'), base_path
+    return pafs.S3FileSystem(region=S3_REGION) if S3_REGION else pafs.FileSystem.from_uri(root)[0], base_path
+
+
+def _count(backend: str, **amounts):
+    with _counters_lock:
+        counters = _counters.setdefault(backend, {'read_requests': 0, 'bytes_read': 0, 'info_requests': 0,
+                                                  'list_requests': 0, 'read_ahead_hits': 0})
+        for key, amount in amounts.items():
+            counters[key] += amount
+
+
+def storage_stats() -> dict:
+    """{backend: counters} since the start of the process."""
+    with _counters_lock:
+        return {backend: dict(counters) for backend, counters in _counters.items()}
+
+
+def coalesce_ranges(ranges: list, hole_bytes: int = COALESCE_HOLE_BYTES, max_bytes: int = COALESCE_MAX_BYTES) -> list:
+    """
+    Merges (offset, length) ranges separated by at most hole_bytes into requests of at most max_bytes
+    (a single range larger than that stays whole). Returns the merged (offset, length), sorted.
+    """
+    merged = []
+    for offset, length in sorted(ranges):
+        if merged:
+            start, end = merged[-1]
+            if offset - end <= hole_bytes and max(end, offset + length) - start <= max_bytes:
+                merged[-1] = (start, max(end, offset + length))
+                continue
+        merged.append((offset, offset + length))
+    return [(start, end - start) for start, end in merged]
+
+
+def read_ranges(fs: pafs.FileSystem, path: str, ranges: list) -> list:
+    """Reads several byte ranges of one file with one request per group of nearby ranges; bytes in the given order."""
+    with fs.open_input_file(path) as f:
+        requests = {request: f.read_at(request[1], request[0]) for request in coalesce_ranges(ranges)}
+    pieces = []
+    for offset, length in ranges:
+        start, data = next((start, data) for (start, size), data in requests.items() if start <= offset and offset + length <= start + size)
+        pieces.append(data[offset - start:offset - start + length])
+    return pieces
+
+
+def parquet_scan_options() -> ds.ParquetFragmentScanOptions:
+    """Parquet scans pre-buffer their column chunks, merged with the same limits as read_ranges."""
+    return ds.ParquetFragmentScanOptions(pre_buffer=True, cache_options=pa.CacheOptions(
+        hole_size_limit=COALESCE_HOLE_BYTES, range_size_limit=COALESCE_MAX_BYTES, lazy=True))
+
+
+class RangedFile(io.RawIOBase):
+    """
+    Base of the seekable read-only files handed to pyarrow (through pa.PythonFile): position and seek/readinto
+    plumbing over read_at(nbytes, offset), which subclasses implement. Shared with disk_cache.CachedFile.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def size(self) -> int:
+        return self._size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._size}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        data = self.read_at(len(buffer), self._position)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def read_at(self, nbytes: int, offset: int) -> bytes:
+        raise NotImplementedError
+
+
+class DelegatingHandler(pafs.FileSystemHandler):
+    """
+    Base of the pafs.PyFileSystem handlers wrapping another filesystem (source_fs): every operation goes straight
+    to it. Subclasses implement open_input_file, get_type_name and __eq__, and override what they intercept.
+    Shared with disk_cache.CachingFileSystemHandler.
+    """
+
+    def __init__(self, source_fs: pafs.FileSystem):
+        self.source_fs = source_fs
+
+    def open_input_stream(self, path):
+        return self.open_input_file(path)
+
+    def get_file_info(self, paths):
+        return self.source_fs.get_file_info(paths)
+
+    def get_file_info_selector(self, selector):
+        return self.source_fs.get_file_info(selector)
+
+    def normalize_path(self, path):
+        return self.source_fs.normalize_path(path)
+
+    def create_dir(self, path, recursive):
+        self.source_fs.create_dir(path, recursive=recursive)
+
+    def delete_dir(self, path):
+        self.source_fs.delete_dir(path)
+
+    def delete_dir_contents(self, path, missing_dir_ok=False):
+        self.source_fs.delete_dir_contents(path, missing_dir_ok=missing_dir_ok)
+
+    def delete_root_dir_contents(self):
+        self.source_fs.delete_dir_contents('/', accept_root_dir=True)
+
+    def delete_file(self, path):
+        self.source_fs.delete_file(path)
+
+    def move(self, src, dest):
+        self.source_fs.move(src, dest)
+
+    def copy_file(self, src, dest):
+        self.source_fs.copy_file(src, dest)
+
+    def open_output_stream(self, path, metadata):
+        return self.source_fs.open_output_stream(path, metadata=metadata)
+
+    def open_append_stream(self, path, metadata):
+        return self.source_fs.open_append_stream(path, metadata=metadata)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class ReadAheadFile(RangedFile):
+    """Seekable read-only file that fetches at least READ_AHEAD_BYTES per request and serves nearby reads from memory."""
+
+    def __init__(self, source: pa.NativeFile, backend: str, read_ahead: int = READ_AHEAD_BYTES):
+        super().__init__(source.size())
+        self._source = source
+        self._backend = backend
+        self._read_ahead = read_ahead
+        self._window_start, self._window = 0, b''
+
+    def read_at(self, nbytes: int, offset: int) -> bytes:
+        end = min(offset + nbytes, self._size)
+        if end <= offset:
+            return b''
+        window_end = self._window_start + len(self._window)
+        if self._window_start <= offset and end <= window_end:
+            _count(self._backend, read_ahead_hits=1)
+        else:
+            # A read near the end of the file (the footer) pulls the whole read-ahead window before it
+            start = max(min(offset, self._size - self._read_ahead), 0) if end - offset < self._read_ahead else offset
+            length = max(end - start, min(self._read_ahead, self._size - start))
+            self._window_start, self._window = start, self._source.read_at(length, start)
+            _count(self._backend, read_requests=1, bytes_read=len(self._window))
+        return self._window[offset - self._window_start:end - self._window_start]
+
+    def close(self):
+        self._source.close()
+        super().close()
+
+
+class StorageHandler(DelegatingHandler):
+    """pafs.PyFileSystem handler adding read-ahead and request counting to a backend's filesystem."""
+
+    def __init__(self, source_fs: pafs.FileSystem, backend: str, read_ahead: int = READ_AHEAD_BYTES):
+        super().__init__(source_fs)
+        self.backend = backend
+        self.read_ahead = read_ahead
+
+    def open_input_file(self, path):
+        return pa.PythonFile(ReadAheadFile(self.source_fs.open_input_file(path), self.backend, self.read_ahead), mode='r')
+
+    def get_file_info(self, paths):
+        _count(self.backend, info_requests=len(paths))
+        return self.source_fs.get_file_info(paths)
+
+    def get_file_info_selector(self, selector):
+        _count(self.backend, list_requests=1)
+        return self.source_fs.get_file_info(selector)
+
+    def get_type_name(self):
+        return f"storage+{self.source_fs.type_name}"
+
+    def __eq__(self, other):
+        return isinstance(other, StorageHandler) and other.source_fs.equals(self.source_fs) and other.backend == self.backend
+
+
+def open_storage(root: str, read_ahead: int = READ_AHEAD_BYTES) -> tuple[pafs.FileSystem, str, str]:
+    """(filesystem with read-ahead and counters, base path, backend name) of a data root; read_ahead 0 reads exact ranges."""
+    source_fs, base_path = source_filesystem(root)
+    backend = backend_name(root)
+    return pafs.PyFileSystem(StorageHandler(source_fs, backend, read_ahead)), base_path, backend
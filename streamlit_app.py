@@ -157,7 +157,7 @@ if selected_client_id:
 
     st.subheader("📊 Score de Crédit et Décision du Modèle")
     try:
-        payload_size_bytes = len(json.dumps(client_api_payload).encode('utf-8'))
+        payload_size_bytes = client_api_payload.size_bytes()
         payload_size_mb = payload_size_bytes / (1024 * 1024) 
         st.info(f"Taille estimée du payload de données envoyé à l'API: {payload_size_mb:.3f} MB")
     except Exception as e_payload_size: 
@@ -1,33 +1,38 @@
 import streamlit as st
 import pandas as pd
-import boto3
+import os
 import traceback
 from io import StringIO # Pour lire une chaîne de caractères comme un fichier
 
-st.set_page_config(page_title="Debug S3 avec Boto3")
-st.title("Test de Connexion S3 avec Boto3")
+from storage import open_storage
 
-BUCKET_NAME = "p8-credit-dashboard-data-paris"
+st.set_page_config(page_title="Debug S3")
+st.title("Test de Connexion au stockage (S3, S3 compatible ou local)")
+
+# Même couche de stockage que l'application : DEBUG_DATA_ROOT peut être un dossier local ou un s3://,
+# et S3_ENDPOINT_URL redirige vers un serveur compatible S3 (MinIO, LocalStack...)
+DATA_ROOT = os.environ.get("DEBUG_DATA_ROOT", "s3://p8-credit-dashboard-data-paris")
 FILE_KEY = "data/application_test.csv"
 
 try:
-    st.write("Initialisation du client S3 avec Boto3...")
-    print("DEBUG: Initialisation du client S3 avec Boto3...")
-    s3_client = boto3.client('s3')
-    st.success("Client S3 initialisé.")
-    print("DEBUG: Client S3 initialisé.")
-
-    st.write(f"Tentative de lecture de l'objet '{FILE_KEY}' depuis le bucket '{BUCKET_NAME}'...")
-    print(f"DEBUG: Tentative de lecture de l'objet '{FILE_KEY}' depuis le bucket '{BUCKET_NAME}'...")
-    
-    # On lit l'objet S3 directement
-    s3_object = s3_client.get_object(Bucket=BUCKET_NAME, Key=FILE_KEY)
-    
-    st.success("s3_client.get_object() a réussi !")
-    print("DEBUG: s3_client.get_object() a réussi !")
+    st.write(f"Initialisation du stockage pour '{DATA_ROOT}'...")
+    print(f"DEBUG: Initialisation du stockage pour '{DATA_ROOT}'...")
+    fs, base_path, backend = open_storage(DATA_ROOT)
+    st.success(f"Stockage initialisé (backend : {backend}).")
+    print(f"DEBUG: Stockage initialisé (backend : {backend}).")
+
+    st.write(f"Tentative de lecture de l'objet '{FILE_KEY}' depuis '{DATA_ROOT}'...")
+    print(f"DEBUG: Tentative de lecture de l'objet '{FILE_KEY}' depuis '{DATA_ROOT}'...")
+
+    # On lit l'objet directement
+    with fs.open_input_stream(f"{base_path}/{FILE_KEY}") as f:
+        file_bytes = f.read()
+
+    st.success("open_input_stream() a réussi !")
+    print("DEBUG: open_input_stream() a réussi !")
 
     # On lit le contenu du fichier
-    file_content = s3_object['Body'].read().decode('utf-8')
+    file_content = file_bytes.decode('utf-8')
     
     st.success("Lecture du contenu du fichier réussie !")
     print("DEBUG: Lecture du contenu du fichier réussie !")
@@ -9,6 +9,8 @@ import numpy as np
 import requests
 
 from utils import load_available_client_ids, get_data_for_client, call_prediction_api, create_gauge_chart, load_all_clients_data, COMPARISON_COLS
+from prefetch import claim_prefetched, prefetch_around
+from warmup import start_warmup
 
 # Notes avant de commencer 
 # Lorsqu'un utilisateur intéragit avec un widget streamlit et c'est une particularité de la librairie :
@@ -369,6 +371,8 @@ def show_graphiques_informations_relatives_au_client(selected_client_id):
     else:
         # --- Graphique pour Variable CATÉGORIELLE (Diagramme en barres) ---
         counts = comparison_df[variable_to_compare].value_counts()
+        # Les colonnes texte sont stockées en 'category' : value_counts garde aussi les catégories absentes du groupe filtré
+        counts = counts[counts > 0]
         
         # Mettre en évidence la barre du client en rouge
         colors = ['red' if cat == client_value else '#1f77b4' for cat in counts.index]
@@ -448,6 +452,12 @@ available_ids = load_available_client_ids()
 if not available_ids:
     st.error("Impossible de charger les IDs. L'application ne peut pas continuer.")
     st.stop()
+
+# Préchauffage des caches en arrière-plan (une seule fois par processus) : la page s'affiche sans l'attendre
+warmup_progress = start_warmup()
+if warmup_progress['state'] in ('pending', 'running'):
+    st.sidebar.caption(f"Préchargement des données en cours ({warmup_progress['step'] or 'démarrage'}, "
+                       f"{warmup_progress['done']}/{warmup_progress['total']} clients)...")
 # 1. Initialize the session state key if it's not already present.
 #    This happens only on the very first run.
 if 'selected_client_id' not in st.session_state:
@@ -496,14 +506,22 @@ st.sidebar.selectbox(
     on_change=update_client_id 
 )
 
+# Prefetching : si l'ID choisi avait été anticipé, on attend son chargement en arrière-plan au lieu de le recharger ;
+# sinon (saut vers un autre ID) les préchargements en attente de la session sont annulés
+claim_prefetched(st.session_state.selected_client_id)
+
 # Page selection
-if page == "Home":
-    show_home_dashboard(st.session_state.selected_client_id)
-elif page == "Graphiques client":
-    show_graphiques_informations_relatives_au_client(st.session_state.selected_client_id)
-elif page == "Informations client":
-    show_informations_relatives_au_client(st.session_state.selected_client_id)
-elif page == "Documentation":
-    show_documentation_page(st.session_state.selected_client_id)
-elif page == "About":
-    show_about_page(st.session_state.selected_client_id)
+try:
+    if page == "Home":
+        show_home_dashboard(st.session_state.selected_client_id)
+    elif page == "Graphiques client":
+        show_graphiques_informations_relatives_au_client(st.session_state.selected_client_id)
+    elif page == "Informations client":
+        show_informations_relatives_au_client(st.session_state.selected_client_id)
+    elif page == "Documentation":
+        show_documentation_page(st.session_state.selected_client_id)
+    elif page == "About":
+        show_about_page(st.session_state.selected_client_id)
+finally:
+    # Une fois la page affichée (même interrompue par st.stop), on précharge les IDs suivants, précédents et récents
+    prefetch_around(st.session_state.selected_client_id, available_ids)
@@ -6,12 +6,82 @@ import numpy as np
 import requests
 import os
 import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.fs as pafs
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from disk_cache import DiskCache, cached_filesystem
+from result_cache import ClientResultCache
+from json_encoder import encode_payload, iter_payload
+from arrow_payload import ARROW_STREAM_MEDIA_TYPE, encode_arrow_parts
+from request_compression import REQUEST_COMPRESSION, compress_pieces, record_api_call
+from storage import backend_name, open_storage, parquet_scan_options, read_ranges, storage_stats
 import traceback # Added for better error logging
 
 # --- CONFIGURATION & CONSTANTS ---
 
 # This is the S3 bucket where your NEW Parquet data is stored.
 S3_BUCKET_NAME = "streamlit-credit-data-bucket-2"
+# DATA_ROOT points the app at another copy of the data: a local folder (e.g. the output of preprocess_data.py)
+# or an S3-compatible server with S3_ENDPOINT_URL set (see storage.py).
+S3_DATA_FOLDER = os.environ.get("DATA_ROOT", f"s3://{S3_BUCKET_NAME}/data_parquet")
+
+# Layout written by preprocess_data.py (see LAYOUT_MODE there): 'hive', 'sorted' or 'bucketed'.
+# With 'sorted', each table folder holds an offset index that points straight at the client's rows.
+# With 'bucketed', the key is hashed to one file and its min/max row group statistics locate the rows.
+DATA_LAYOUT = os.environ.get("DATA_LAYOUT", "hive")
+CLIENT_INDEX_FILENAME = "_client_index.parquet"
+BUCKET_LAYOUT_FILENAME = "_bucket_layout.json"
+# With 'hive', the partition manifest lists the files of every partition value, so a client resolves to its
+# object keys without listing the table folder (tables built before the manifest fall back to discovery).
+PARTITION_MANIFEST_FILENAME = "_partition_manifest.parquet"
+
+# Optional single-file store written by `preprocess_data.py --bundles` (local folder or s3:// URI).
+# When set, a client is served from one ranged read of a few KB instead of one Parquet read per table.
+CLIENT_BUNDLE_PATH = os.environ.get("CLIENT_BUNDLE_PATH")
+BUNDLE_DATA_FILENAME = "bundles.bin"
+BUNDLE_INDEX_FILENAME = "_bundle_index.parquet"
+BUNDLE_COMPRESSION = "zstd"
+
+# Client-keyed tables read by get_data_for_client: payload name -> Parquet table.
+# They are all keyed by SK_ID_CURR (bureau_balance has it joined on), so they are fetched concurrently.
+CLIENT_TABLES = {
+    "bureau": "bureau.parquet",
+    "bureau_balance": "bureau_balance.parquet",
+    "previous_application": "previous_application.parquet",
+    "POS_CASH_balance": "POS_CASH_balance.parquet",
+    "installments_payments": "installments_payments.parquet",
+    "credit_card_balance": "credit_card_balance.parquet"
+}
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "6")) # concurrent table reads per client view
+
+# Local disk cache in front of S3 (see disk_cache.py): blocks of the objects read are kept on local disk, so
+# repeat lookups and restarted processes read them at disk speed. 0 MB disables it; local roots are never cached.
+DISK_CACHE_DIR = os.environ.get("DISK_CACHE_DIR", "/tmp/credit_dashboard_cache")
+DISK_CACHE_MAX_MB = int(os.environ.get("DISK_CACHE_MAX_MB", "1024"))
+
+# Per-client results of get_data_for_client (see result_cache.py), bounded by the memory they really take so the
+# cache cannot outgrow the container however many clients are viewed. Policy 'lru' or 'lfu'; TTL 0 never expires.
+RESULT_CACHE_MAX_MB = int(os.environ.get("RESULT_CACHE_MAX_MB", "256"))
+RESULT_CACHE_POLICY = os.environ.get("RESULT_CACHE_POLICY", "lru")
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", "3600"))
+
+# Body of the prediction API request, encoded column by column (see json_encoder.py): 'records' is the format the
+# API has always read ([{column: value}, ...] per table); 'columns' ({column: [values]} per table) is sent with
+# the X-Payload-Layout header, for API versions that read it.
+API_PAYLOAD_LAYOUT = os.environ.get("API_PAYLOAD_LAYOUT", "records")
+# Transport of the payload: 'json' (the body above) or 'arrow' (every table as a compressed Arrow IPC stream in one
+# multipart body, see arrow_payload.py). The JSON body is compressed above a size threshold when
+# API_REQUEST_COMPRESSION is set (see request_compression.py). An API that refuses the Arrow body, or the
+# compressed body, with one of REFUSED_STATUSES gets plain JSON instead, and from then on.
+API_PAYLOAD_FORMAT = os.environ.get("API_PAYLOAD_FORMAT", "json")
+REFUSED_STATUSES = (400, 415, 422)
 
 # These lists of columns are still relevant, as they describe the columns
 # that will be present in the data we read from the Parquet files.
@@ -49,6 +119,88 @@ APPLICATION_TEST_COLS_NEEDED = [
 
 # --- HELPER FUNCTION DEFINITIONS ---
 
+# --- Long-lived storage handles ---
+# Created once per process with st.cache_resource and shared by every session: the filesystem keeps its pool of
+# S3 connections, and the datasets and Parquet footers are discovered once instead of on every read.
+
+@st.cache_resource
+def get_disk_cache() -> DiskCache:
+    """The process-wide disk cache, indexed once from what previous processes left in DISK_CACHE_DIR."""
+    print(f"Opening disk cache: {DISK_CACHE_DIR} ({DISK_CACHE_MAX_MB} MB)")
+    return DiskCache(DISK_CACHE_DIR, DISK_CACHE_MAX_MB * 1024 * 1024)
+
+
+@st.cache_resource
+def get_filesystem(root: str) -> tuple[pafs.FileSystem, str]:
+    """
+    Filesystem and base path of a data root (local folder, s3:// URI or S3-compatible server) from the storage
+    layer, which counts requests. Remote roots go through the disk cache, whose block reads are what widen the
+    requests to S3: the storage read-ahead beneath it is off, since it would never see a read smaller than a block.
+    Without the cache (local folders, DISK_CACHE_MAX_MB 0) the storage layer reads ahead itself.
+    """
+    if DISK_CACHE_MAX_MB and backend_name(root) != 'local':
+        fs, base_path, _ = open_storage(root, read_ahead=0)
+        return cached_filesystem(fs, get_disk_cache()), base_path
+    fs, base_path, _ = open_storage(root)
+    return fs, base_path
+
+
+@st.cache_resource
+def get_dataset(root: str, table_name: str) -> ds.Dataset:
+    """
+    Parquet dataset of a table (single file or folder). With the hive layout the LIST of the partition folders
+    happens here, once; reads then prune the known fragments on the partition filter.
+    """
+    print(f"Discovering dataset: {root}/{table_name}")
+    fs, base_path = get_filesystem(root)
+    # Same partitioning as pd.read_parquet, so the partition column keeps its dictionary type
+    # Scans pre-buffer their column chunks, nearby ranges merged into single requests
+    return ds.dataset(f"{base_path}/{table_name}", filesystem=fs, format=ds.ParquetFileFormat(default_fragment_scan_options=parquet_scan_options()),
+                      partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+
+
+@st.cache_resource
+def get_parquet_footer(root: str, file_path: str) -> pq.FileMetaData:
+    """Footer of a Parquet file, read once per process."""
+    fs, base_path = get_filesystem(root)
+    with fs.open_input_file(f"{base_path}/{file_path}") as f:
+        return pq.ParquetFile(f).metadata
+
+
+def read_parquet_row_groups(root: str, file_path: str, row_groups: list) -> pa.Table:
+    """Reads row groups of a Parquet file whose footer is already known, so only the row groups are fetched."""
+    fs, base_path = get_filesystem(root)
+    with fs.open_input_file(f"{base_path}/{file_path}") as f:
+        # pre_buffer: the column chunks of all the row groups are fetched in coalesced ranges, not one read each
+        return pq.ParquetFile(f, metadata=get_parquet_footer(root, file_path), pre_buffer=True).read_row_groups(row_groups)
+
+
+@st.cache_resource
+def get_application_table(app_file_name: str = "application_test.parquet") -> tuple[pa.Table, pd.Index]:
+    """
+    Loads application_test once per process, as one Arrow table shared by all its consumers (client IDs,
+    client rows, comparison charts), with an SK_ID_CURR -> row position index for O(1) single-client lookups.
+    """
+    print(f"Loading shared application table from: {S3_DATA_FOLDER}/{app_file_name}")
+    table = get_dataset(S3_DATA_FOLDER, app_file_name).to_table()
+    # pandas turns integer columns with missing values into float64: cast them once, so a single row converts
+    # to the same dtypes (and JSON values) as the whole table did
+    for position, field in enumerate(table.schema):
+        if pa.types.is_integer(field.type) and table.column(position).null_count:
+            table = table.set_column(position, field.name, table.column(position).cast(pa.float64()))
+    return table, pd.Index(table.column('SK_ID_CURR').to_numpy())
+
+
+def get_application_rows(client_id: int) -> pd.DataFrame:
+    """Rows of one client in the shared application table, labelled with their row position in the table."""
+    table, row_index = get_application_table()
+    positions = row_index.get_indexer_for([client_id])
+    positions = positions[positions >= 0]
+    client_df = table.take(positions).to_pandas()
+    client_df.index = positions
+    return client_df
+
+
 # UPDATED to read from the efficient application_test.parquet file
 @st.cache_data
 def load_available_client_ids(app_file_name: str = "application_test.parquet") -> list:
@@ -56,11 +208,11 @@ def load_available_client_ids(app_file_name: str = "application_test.parquet") -
     Loads unique SK_ID_CURR values from the small application_test.parquet file for very fast startup.
     """
     try:
-        s3_path = f"s3://{S3_BUCKET_NAME}/data_parquet/{app_file_name}"
+        s3_path = f"{S3_DATA_FOLDER}/{app_file_name}"
         print(f"Loading available client IDs from: {s3_path}")
-        # Read only the single column we need for maximum efficiency
-        df = pd.read_parquet(s3_path, columns=['SK_ID_CURR'])
-        client_ids = sorted(df['SK_ID_CURR'].unique().tolist())
+        # The IDs come from the index of the shared application table, which the client views reuse
+        _, row_index = get_application_table(app_file_name)
+        client_ids = sorted(row_index.unique().tolist())
         if not client_ids: 
             st.error(f"No client IDs found in '{s3_path}'.")
             return []
@@ -93,66 +245,452 @@ def prepare_df_for_json(df_orig: pd.DataFrame) -> list:
     return df.astype(object).where(pd.notnull(df), None).to_dict(orient='records')
 
 
+class ClientPayload:
+    """
+    API payload of one client: its tables ({payload name: DataFrame}) and their bodies, each encoded once.
+    The JSON body is what json.dumps({name: prepare_df_for_json(df)}) gives, without building the records: it is
+    encoded in pieces through the request compressor and kept as bytes, compressed above the threshold (or not, once
+    an API has refused compressed bodies); the Arrow parts are the tables as compressed IPC streams.
+    """
+
+    def __init__(self, tables: dict, layout: str = API_PAYLOAD_LAYOUT, payload_format: str = API_PAYLOAD_FORMAT):
+        self.tables = tables
+        self.layout = layout
+        self._json_request = None
+        self._arrow_parts = None
+        self.arrow_seconds = 0.0
+        self.size_bytes(payload_format) # encodes the body of that transport now, so the result cache holds and sizes it
+
+    @property
+    def json_request(self) -> dict:
+        """The JSON body as it is sent, with its Content-Encoding, uncompressed size and encoding time (compress_pieces)."""
+        if self._json_request is None:
+            self._json_request = compress_pieces(iter_payload(self.tables, self.layout))
+        return self._json_request
+
+    @property
+    def json_body(self) -> bytes:
+        """The uncompressed JSON body (encoded again when the one kept is compressed)."""
+        if self.json_request['content_encoding'] is None:
+            return self.json_request['body']
+        return encode_payload(self.tables, self.layout)
+
+    def uncompressed_json_request(self) -> dict:
+        """
+        json_request for an API that refuses compressed bodies: a compressed body is replaced by the uncompressed one,
+        encoded this once and kept, so the cached payload is not encoded again on every call to that API.
+        """
+        if self.json_request['content_encoding'] is not None:
+            self._json_request = compress_pieces(iter_payload(self.tables, self.layout), 'none')
+        return self._json_request
+
+    @property
+    def arrow_parts(self) -> dict | None:
+        """{payload name: Arrow IPC stream}, or None when a table cannot be converted to Arrow."""
+        if self._arrow_parts is None:
+            start = time.perf_counter()
+            try:
+                self._arrow_parts = encode_arrow_parts(self.tables)
+            except (pa.ArrowException, ValueError, TypeError) as e:
+                print(f"Arrow payload unavailable, the JSON body will be sent: {e}")
+                self._arrow_parts = {}
+            self.arrow_seconds = time.perf_counter() - start
+        return self._arrow_parts or None
+
+    def size_bytes(self, payload_format: str = API_PAYLOAD_FORMAT) -> int:
+        """Size of the body sent with payload_format ('json' or 'arrow'; JSON when the tables cannot be sent as Arrow)."""
+        if payload_format == 'arrow' and self.arrow_parts is not None:
+            return sum(len(data) for data in self.arrow_parts.values())
+        return len(self.json_request['body'])
+
+    def to_dict(self) -> dict:
+        """The payload as {payload name: records}, as prepare_df_for_json builds them."""
+        return {name: prepare_df_for_json(df) for name, df in self.tables.items()}
+
+
+# API URLs that refused the Arrow body (they get JSON) or a compressed body (they get it uncompressed), for the
+# rest of the process
+_arrow_refused_urls = set()
+_compression_refused_urls = set()
+
+
+def _post(api_url: str, call: dict, **request_kwargs) -> requests.Response:
+    """
+    requests.post, recorded by record_api_call. call holds payload_format, content_encoding, encode_seconds and
+    raw_bytes (the body size before compression; the size sent when omitted).
+    """
+    start = time.perf_counter()
+    response = requests.post(api_url, timeout=300, **request_kwargs)
+    sent_bytes = len(response.request.body or b'')
+    record_api_call(**{'raw_bytes': sent_bytes, **call}, sent_bytes=sent_bytes,
+                    request_seconds=time.perf_counter() - start, status=response.status_code)
+    return response
+
+
+def post_arrow_payload(payload: ClientPayload, api_url: str) -> requests.Response | None:
+    """
+    Posts the payload as one multipart part per table (Arrow IPC stream). Returns None when there is nothing to
+    send as Arrow or when the API refuses the format, so the caller sends JSON instead.
+    """
+    if payload.arrow_parts is None:
+        return None
+    files = {name: (f"{name}.arrows", data, ARROW_STREAM_MEDIA_TYPE) for name, data in payload.arrow_parts.items()}
+    response = _post(api_url, {'payload_format': 'arrow', 'content_encoding': None, 'encode_seconds': payload.arrow_seconds},
+                     files=files, headers={'Accept': 'application/json'})
+    if response.status_code in REFUSED_STATUSES:
+        _arrow_refused_urls.add(api_url)
+        print(f"The API at {api_url} refused the Arrow payload ({response.status_code}): sending JSON from now on.")
+        return None
+    return response
+
+
+def post_json_payload(payload: ClientPayload | dict, api_url: str) -> requests.Response:
+    """
+    Posts the JSON body, compressed when it is large enough. An API that refuses the compressed body gets it
+    uncompressed, and only uncompressed bodies from then on.
+    """
+    if isinstance(payload, ClientPayload):
+        layout, json_request, uncompressed_request = payload.layout, lambda: payload.json_request, payload.uncompressed_json_request
+    else: # a {name: records} dict, encoded as before
+        layout, body = 'records', json.dumps(payload, allow_nan=False).encode('utf-8')
+        json_request, uncompressed_request = lambda: compress_pieces([body], REQUEST_COMPRESSION), lambda: compress_pieces([body], 'none')
+    request = uncompressed_request() if api_url in _compression_refused_urls else json_request()
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    if layout != 'records':
+        headers['X-Payload-Layout'] = layout
+
+    if request['content_encoding'] is not None:
+        response = _post(api_url, {'payload_format': 'json', 'content_encoding': request['content_encoding'],
+                                   'raw_bytes': request['raw_bytes'], 'encode_seconds': request['seconds']},
+                         data=request['body'], headers={**headers, 'Content-Encoding': request['content_encoding']})
+        if response.status_code not in REFUSED_STATUSES:
+            return response
+        _compression_refused_urls.add(api_url)
+        print(f"The API at {api_url} refused the {request['content_encoding']} body ({response.status_code}): sending it uncompressed from now on.")
+        request = uncompressed_request()
+
+    return _post(api_url, {'payload_format': 'json', 'content_encoding': None, 'encode_seconds': request['seconds']},
+                 data=request['body'], headers=headers)
+
+
+def rows_with_keys(df: pd.DataFrame, key: str, values: list) -> pd.DataFrame:
+    """Rows of df (sorted by key) whose key is in values, found by binary search instead of a scan of the column."""
+    keys = df[key].to_numpy()
+    positions = [position for value in values
+                 for position in range(np.searchsorted(keys, value, 'left'), np.searchsorted(keys, value, 'right'))]
+    return df.iloc[positions]
+
+
+@st.cache_resource
+def load_client_index(table_name: str, key: str) -> pd.DataFrame:
+    """
+    Loads the offset index of a table written with the 'sorted' layout, sorted by key (see rows_with_keys).
+    Each row maps a key value to (file, row_group, row_start, row_count).
+    Loaded once per process and shared, not copied per lookup: callers treat it as read-only.
+    """
+    index_path = f"{S3_DATA_FOLDER}/{table_name}/{CLIENT_INDEX_FILENAME}"
+    print(f"Loading offset index from: {index_path}")
+    fs, base_path = get_filesystem(S3_DATA_FOLDER)
+    index_df = pq.read_table(f"{base_path}/{table_name}/{CLIENT_INDEX_FILENAME}", filesystem=fs).to_pandas()
+    return index_df.sort_values(key, kind='stable', ignore_index=True)
+
+
+@st.cache_resource
+def load_bucket_layout(table_name: str) -> dict:
+    """Loads the bucket count and key of a table written with the 'bucketed' layout."""
+    fs, base_path = get_filesystem(S3_DATA_FOLDER)
+    with fs.open_input_stream(f"{base_path}/{table_name}/{BUCKET_LAYOUT_FILENAME}") as f:
+        return json.loads(f.read())
+
+
+@st.cache_resource
+def load_partition_manifest(table_name: str) -> tuple[pd.DataFrame, pa.Schema, pa.Schema | None] | None:
+    """
+    Loads the partition manifest of a table written with the 'hive' layout: one row per file with its partition
+    value (first column, sorted for rows_with_keys) and path, plus the schema of the data files and the schema
+    of the table (partition key included; None for manifests written before it was stored), from its metadata.
+    None if the table has no manifest. Loaded once per process and shared: callers treat it as read-only.
+    """
+    fs, base_path = get_filesystem(S3_DATA_FOLDER)
+    manifest_path = f"{base_path}/{table_name}/{PARTITION_MANIFEST_FILENAME}"
+    if fs.get_file_info(manifest_path).type == pafs.FileType.NotFound:
+        return None
+    print(f"Loading partition manifest from: {S3_DATA_FOLDER}/{table_name}/{PARTITION_MANIFEST_FILENAME}")
+    manifest_table = pq.read_table(manifest_path, filesystem=fs)
+    manifest_df = manifest_table.to_pandas()
+    manifest_df = manifest_df.sort_values(manifest_df.columns[0], kind='stable', ignore_index=True)
+    metadata = manifest_table.schema.metadata
+    table_schema = pa.ipc.read_schema(pa.py_buffer(metadata[b'table_schema'])) if b'table_schema' in metadata else None
+    return manifest_df, pa.ipc.read_schema(pa.py_buffer(metadata[b'file_schema'])), table_schema
+
+
+def read_partition_files(table_name: str, key: str, values: list) -> pa.Table | None:
+    """
+    Reads the rows of a 'hive' table whose key is in values from the exact files its manifest lists for them.
+    The partition column is not stored in the files; it is added back with its type and at its place in the table
+    schema, so the rows are the same as in the other layouts. With a manifest written before the table schema was
+    stored, it is appended dictionary-encoded, as dataset discovery does. Returns None when the table has no manifest.
+    """
+    manifest = load_partition_manifest(table_name)
+    if manifest is None:
+        return None
+    manifest_df, file_schema, table_schema = manifest
+    fs, base_path = get_filesystem(S3_DATA_FOLDER)
+    key_type = table_schema.field(key).type if table_schema else pa.dictionary(pa.int32(), pa.int32())
+    pieces = []
+    for value, path in rows_with_keys(manifest_df, key, values)[[key, 'path']].itertuples(index=False):
+        with fs.open_input_file(f"{base_path}/{table_name}/{path}") as f:
+            table = pq.ParquetFile(f, pre_buffer=True).read()
+        if table_schema:
+            key_column = pa.array(np.full(table.num_rows, int(value)), key_type)
+        else:
+            key_column = pa.DictionaryArray.from_arrays(pa.array(np.zeros(table.num_rows, dtype=np.int32)), pa.array([int(value)], pa.int32()))
+        pieces.append(table.append_column(key, key_column))
+    if pieces:
+        table = pa.concat_tables(pieces)
+    else:
+        table = file_schema.empty_table().append_column(key, pa.array([], key_type))
+    return table.select(table_schema.names) if table_schema else table
+
+
+def bucket_of(key: int, bucket_count: int) -> int:
+    """Same Knuth multiplicative hash as preprocess_data.bucket_of, for a single key."""
+    return (key * 2654435761) % 2**32 % bucket_count
+
+
+def read_bucketed_rows(table_name: str, key: str, values: list) -> pa.Table | None:
+    """
+    Reads the rows of a 'bucketed' table whose key is in values: one file per bucket involved, and inside it
+    only the row groups whose min/max statistics can contain the key (one, since the bucket is sorted).
+    Without matching rows, the table is empty with the bucket file's schema; None only when values is empty.
+    """
+    bucket_count = load_bucket_layout(table_name)['buckets']
+    values_by_bucket = {}
+    for value in values:
+        values_by_bucket.setdefault(bucket_of(int(value), bucket_count), []).append(int(value))
+
+    pieces, schema = [], None
+    for bucket, bucket_values in values_by_bucket.items():
+        file_path = f"{table_name}/bucket-{bucket:05d}.parquet"
+        # The footer is cached per process, so the pruning costs no request
+        metadata = get_parquet_footer(S3_DATA_FOLDER, file_path)
+        schema = metadata.schema.to_arrow_schema()
+        key_position = schema.get_field_index(key)
+        row_groups = []
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(key_position).statistics
+            if statistics is None or any(statistics.min <= value <= statistics.max for value in bucket_values):
+                row_groups.append(row_group)
+        if row_groups:
+            candidates = read_parquet_row_groups(S3_DATA_FOLDER, file_path, row_groups)
+            pieces.append(candidates.filter(pc.is_in(candidates.column(key), value_set=pa.array(bucket_values, candidates.schema.field(key).type))))
+    if pieces:
+        return pa.concat_tables(pieces)
+    return schema.empty_table() if schema is not None else None
+
+
+def read_client_rows(table_name: str, key: str, values: list) -> pd.DataFrame:
+    """
+    Reads the rows of a table whose key is in values, using the layout configured in DATA_LAYOUT.
+    The columns come in the table's order whatever the layout: the 'sorted' and 'bucketed' files store it, and
+    'hive' puts the partition column back in place from the manifest (tables whose manifest predates the stored
+    order, or that have none, keep it last, as dataset discovery returns it).
+    """
+    if DATA_LAYOUT == "sorted":
+        index_df = load_client_index(table_name, key)
+        entries = rows_with_keys(index_df, key, values)
+        if entries.empty:
+            # No rows: an empty frame with the table's columns and types, read from a footer (cached, no request)
+            footer = get_parquet_footer(S3_DATA_FOLDER, f"{table_name}/{index_df['file'].iloc[0]}")
+            return footer.schema.to_arrow_schema().empty_table().to_pandas()
+        pieces = []
+        # One ranged read per row group; the layout keeps a client's rows inside a single row group
+        for (file_name, row_group), group_entries in entries.groupby(['file', 'row_group']):
+            row_group_table = read_parquet_row_groups(S3_DATA_FOLDER, f"{table_name}/{file_name}", [int(row_group)])
+            for entry in group_entries.itertuples():
+                pieces.append(row_group_table.slice(int(entry.row_start), int(entry.row_count)))
+        return pa.concat_tables(pieces).to_pandas()
+    if DATA_LAYOUT == "bucketed":
+        table = read_bucketed_rows(table_name, key, values)
+        return table.to_pandas() if table is not None else pd.DataFrame()
+
+    table = read_partition_files(table_name, key, values)
+    if table is not None:
+        return table.to_pandas()
+    id_filter = [(key, '=', values[0])] if len(values) == 1 else [(key, 'in', values)]
+    return get_dataset(S3_DATA_FOLDER, table_name).to_table(filter=pq.filters_to_expression(id_filter)).to_pandas()
+
+
+@st.cache_resource
+def load_bundle_index() -> tuple[pd.DataFrame, dict, dict]:
+    """
+    Loads the offset index of the client bundle store (indexed by SK_ID_CURR), the schema of each table's batches
+    and the registry schema they are cast back to (absent from stores built before it was added), all stored once
+    in the index metadata. Loaded once per process and shared.
+    """
+    index_path = f"{CLIENT_BUNDLE_PATH}/{BUNDLE_INDEX_FILENAME}"
+    print(f"Loading client bundle index from: {index_path}")
+    fs, base_path = get_filesystem(CLIENT_BUNDLE_PATH)
+    index_table = pq.read_table(f"{base_path}/{BUNDLE_INDEX_FILENAME}", filesystem=fs)
+    schemas, table_schemas = {}, {}
+    for key, value in index_table.schema.metadata.items():
+        kind, _, name = key.decode().partition(':')
+        if kind in ('schema', 'table_schema'):
+            (schemas if kind == 'schema' else table_schemas)[name] = pa.ipc.read_schema(pa.py_buffer(value))
+    return index_table.to_pandas().set_index('SK_ID_CURR'), schemas, table_schemas
+
+
+def read_client_bundle(client_id: int) -> dict | None:
+    """
+    Reads the bundle of one client and returns {payload name: DataFrame}, or None if the client is not in the store.
+    """
+    index_df, schemas, table_schemas = load_bundle_index()
+    if client_id not in index_df.index:
+        return None
+    entry = index_df.loc[client_id]
+    fs, base_path = get_filesystem(CLIENT_BUNDLE_PATH)
+    record, = read_ranges(fs, f"{base_path}/{BUNDLE_DATA_FILENAME}", [(int(entry['offset']), int(entry['length']))])
+    raw = pa.decompress(record, decompressed_size=int(entry['raw_length']), codec=BUNDLE_COMPRESSION)
+
+    tables = {}
+    position = 0
+    for name, schema in schemas.items():
+        size = int.from_bytes(raw[position:position + 4].to_pybytes(), 'little')
+        batch = pa.ipc.read_record_batch(raw.slice(position + 4, size), schema)
+        # A serialized batch carries no dictionaries: the categorical columns are re-encoded, as the tables store them
+        tables[name] = pa.Table.from_batches([batch]).cast(table_schemas[name]).to_pandas() if name in table_schemas else batch.to_pandas()
+        position += 4 + size
+    return tables
+
+
+@st.cache_resource
+def load_table_columns(table_name: str) -> list:
+    """
+    Column names of a table, partition column included: from its partition manifest when it has one ('hive'),
+    otherwise from its dataset (files starting with '_', such as the indexes, are not part of it).
+    """
+    manifest = load_partition_manifest(table_name) if DATA_LAYOUT == "hive" else None
+    if manifest is not None:
+        manifest_df, file_schema, table_schema = manifest
+        return table_schema.names if table_schema else file_schema.names + [manifest_df.columns[0]]
+    return get_dataset(S3_DATA_FOLDER, table_name).schema.names
+
+
+def read_bureau_balance_rows(client_id: int) -> pd.DataFrame:
+    """
+    Rows of bureau_balance for one client. Tables built by preprocess_data.py carry SK_ID_CURR and are read
+    directly; a table built before that change is read the old way, through the client's SK_ID_BUREAU in bureau.
+    """
+    table_name = CLIENT_TABLES["bureau_balance"]
+    if 'SK_ID_CURR' in load_table_columns(table_name):
+        return read_client_rows(table_name, 'SK_ID_CURR', [client_id])
+    print(f"  {table_name} has no SK_ID_CURR (built before it was joined on): looking it up through the bureau ids.")
+    bureau_df = read_client_rows(CLIENT_TABLES["bureau"], 'SK_ID_CURR', [client_id])
+    if bureau_df.empty or 'SK_ID_BUREAU' not in bureau_df.columns:
+        return pd.DataFrame()
+    return read_client_rows(table_name, 'SK_ID_BUREAU', bureau_df['SK_ID_BUREAU'].unique().tolist())
+
+
+def fetch_client_tables(client_id: int, extra_reads: dict | None = None) -> dict:
+    """
+    Reads the rows of one client from every table of CLIENT_TABLES concurrently, in a pool of FETCH_WORKERS threads
+    (pyarrow releases the GIL while it waits on S3), so the view takes about as long as the slowest read.
+    extra_reads ({name: callable}) are run in the same pool. Prints the time of each fetch and returns {name: result}.
+    """
+    reads = {name: (lambda table_name=table_name: read_client_rows(table_name, 'SK_ID_CURR', [client_id]))
+             for name, table_name in CLIENT_TABLES.items()}
+    reads["bureau_balance"] = lambda: read_bureau_balance_rows(client_id)
+    reads.update(extra_reads or {})
+
+    def timed(read):
+        start = time.perf_counter()
+        result = read()
+        return result, time.perf_counter() - start
+
+    # The worker threads share the session's script context, so st.cache_data works in them as in the main thread
+    ctx = get_script_run_ctx()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS, initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)) as executor:
+        futures = {name: executor.submit(timed, read) for name, read in reads.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    for name, (_, seconds) in results.items():
+        print(f"  fetch {name:<24} {seconds * 1000:>8.1f} ms")
+    print(f"  fetch total (concurrent)        {(time.perf_counter() - start) * 1000:>8.1f} ms")
+    if DISK_CACHE_MAX_MB and backend_name(S3_DATA_FOLDER) != 'local': # remote root behind the disk cache
+        stats = get_disk_cache().stats()
+        print(f"  disk cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+              f"{stats['evictions']} evictions, {stats['size_mb']:.1f} MB")
+    for backend, counters in storage_stats().items():
+        print(f"  storage {backend}: {counters['read_requests']} reads ({counters['bytes_read'] / 1024:.0f} KB, "
+              f"{counters['read_ahead_hits']} served by read-ahead), {counters['info_requests']} info, {counters['list_requests']} list")
+    return {name: result for name, (result, _) in results.items()}
+
+
+@st.cache_resource
+def get_client_result_cache() -> ClientResultCache:
+    """The process-wide cache of get_data_for_client results, shared by all sessions."""
+    return ClientResultCache(RESULT_CACHE_MAX_MB * 1024 * 1024, RESULT_CACHE_POLICY, RESULT_CACHE_TTL_SECONDS)
+
+
+def get_data_for_client(client_id: int) -> tuple[ClientPayload | None, pd.DataFrame | None]:
+    """
+    Returns (API payload, descriptive DataFrame) of a client from the result cache, loading it on a miss.
+    The cached objects are shared between sessions: callers treat them as read-only.
+    """
+    cache = get_client_result_cache()
+    result = cache.get(client_id)
+    if result is not None:
+        return result
+    result = load_data_for_client(client_id)
+    if result[0] is not None: # failures are not cached, the next view retries
+        size = cache.put(client_id, result)
+        stats = cache.stats()
+        print(f"  result cache: stored client {client_id} ({size / 1024:.1f} KB), {stats['entries']} entries, "
+              f"{stats['size_mb']:.1f}/{stats['budget_mb']:.0f} MB, hit rate {stats['hit_rate']:.0%}, {stats['evictions']} evictions")
+    return result
+
+
 # COMPLETELY REWRITTEN to be fast and efficient using Parquet
-@st.cache_data
-def get_data_for_client(client_id: int) -> tuple[dict | None, pd.DataFrame | None]:
+def load_data_for_client(client_id: int) -> tuple[ClientPayload | None, pd.DataFrame | None]:
     """
     Loads data for a single client efficiently from schema-aware, partitioned Parquet files on S3.
     """
-    S3_DATA_FOLDER = f"s3://{S3_BUCKET_NAME}/data_parquet"
-    
     print(f"--- DÉBUT: get_data_for_client (SCHEMA-AWARE PARQUET) pour client ID: {client_id} ---")
 
     try:
-        # Define the primary filter for most tables, which will be used for fast lookups.
-        id_filter = [('SK_ID_CURR', '=', client_id)]
-
-        # --- 1. current_app (read from the single parquet file) ---
-        # It's small and efficient to read the whole thing once and filter in memory.
-        @st.cache_data
-        def load_app_test_data_parquet():
-            print("Loading application_test.parquet...")
-            return pd.read_parquet(f"{S3_DATA_FOLDER}/application_test.parquet")
-        
-        df_app_test_full = load_app_test_data_parquet()
-        client_main_descriptive_df = df_app_test_full[df_app_test_full['SK_ID_CURR'] == client_id]
+        # --- 0. Single-read path through the client bundle store, when it is configured ---
+        if CLIENT_BUNDLE_PATH:
+            client_tables = read_client_bundle(client_id)
+            if client_tables is None:
+                st.error(f"Client ID {client_id} not found in the client bundle store.")
+                return None, None
+            # current_app comes from the shared application table, as below, so the payload and the descriptive
+            # DataFrame are the same whichever path built them (float64 nullable integers, row position index)
+            client_tables['current_app'] = get_application_rows(client_id)
+            api_payload = ClientPayload(client_tables)
+            print("--- FIN: get_data_for_client (CLIENT BUNDLE) ---")
+            return api_payload, client_tables['current_app']
+
+        # --- 1. current_app: an index lookup in the shared application table (loaded once per process) ---
+        # --- 2-7. The six client-keyed tables, all read concurrently with it ---
+        # preprocess_data.py joins SK_ID_CURR onto bureau_balance, so it no longer waits for the bureau ids
+        # (a bureau_balance built before that is still read through them, see read_bureau_balance_rows).
+        print("Reading partitioned data files concurrently...")
+        client_tables = fetch_client_tables(client_id, extra_reads={"current_app": lambda: get_application_rows(client_id)})
+
+        client_main_descriptive_df = client_tables.pop("current_app")
 
         if client_main_descriptive_df.empty:
             st.error(f"Client ID {client_id} not found in application_test.parquet.")
             return None, None
 
-        # --- 2. Bureau (Partitioned by SK_ID_CURR) ---
-        print("Reading partitioned bureau data...")
-        client_bureau_df = pd.read_parquet(f"{S3_DATA_FOLDER}/bureau.parquet", filters=id_filter)
-        
-        # --- 3. Bureau Balance (Partitioned by SK_ID_BUREAU) ---
-        # This is the crucial two-step lookup based on your data schema.
-        print("Reading partitioned bureau_balance data...")
-        if not client_bureau_df.empty and 'SK_ID_BUREAU' in client_bureau_df.columns:
-            bureau_ids = client_bureau_df['SK_ID_BUREAU'].unique().tolist()
-            bureau_id_filter = [('SK_ID_BUREAU', 'in', bureau_ids)]
-            client_bureau_balance_df = pd.read_parquet(f"{S3_DATA_FOLDER}/bureau_balance.parquet", filters=bureau_id_filter)
-        else:
-            # If the client has no loans in the bureau file, they won't have bureau_balance records.
-            client_bureau_balance_df = pd.DataFrame() 
-
-        # --- 4-7. Read all other related tables (All Partitioned by SK_ID_CURR) ---
-        print("Reading other partitioned data files...")
-        client_prev_app_df = pd.read_parquet(f"{S3_DATA_FOLDER}/previous_application.parquet", filters=id_filter)
-        client_pos_cash_df = pd.read_parquet(f"{S3_DATA_FOLDER}/POS_CASH_balance.parquet", filters=id_filter)
-        client_installments_df = pd.read_parquet(f"{S3_DATA_FOLDER}/installments_payments.parquet", filters=id_filter)
-        client_credit_card_df = pd.read_parquet(f"{S3_DATA_FOLDER}/credit_card_balance.parquet", filters=id_filter)
+        if 'SK_ID_CURR' in client_tables["bureau_balance"].columns:
+            # The API expects the original bureau_balance columns (SK_ID_BUREAU, MONTHS_BALANCE, STATUS)
+            client_tables["bureau_balance"] = client_tables["bureau_balance"].drop(columns=['SK_ID_CURR'])
 
         # --- Prepare the final API payload ---
-        api_payload = {
-            "current_app": prepare_df_for_json(client_main_descriptive_df),
-            "bureau": prepare_df_for_json(client_bureau_df),
-            "bureau_balance": prepare_df_for_json(client_bureau_balance_df),
-            "previous_application": prepare_df_for_json(client_prev_app_df),
-            "POS_CASH_balance": prepare_df_for_json(client_pos_cash_df),
-            "installments_payments": prepare_df_for_json(client_installments_df),
-            "credit_card_balance": prepare_df_for_json(client_credit_card_df)
-        }
+        api_payload = ClientPayload({"current_app": client_main_descriptive_df, **client_tables})
         
         print("--- FIN: get_data_for_client (SCHEMA-AWARE PARQUET) ---")
         return api_payload, client_main_descriptive_df
@@ -163,16 +701,21 @@ def get_data_for_client(client_id: int) -> tuple[dict | None, pd.DataFrame | Non
         return None, None
 
 
-# UNCHANGED: This function is generic and works perfectly as is.
-def call_prediction_api(payload_dict: dict, api_url_param: str) -> dict | None:
+def call_prediction_api(payload: ClientPayload | dict, api_url_param: str) -> dict | None:
     """
     Sends the prepared data payload to the prediction API and returns the response.
+    A ClientPayload is sent as Arrow when API_PAYLOAD_FORMAT is 'arrow' and the API accepts it, otherwise as its
+    pre-encoded JSON body (compressed above the threshold); a {name: records} dict is encoded as before.
     """
     if not api_url_param: 
         st.error("API_URL parameter is missing or empty for call_prediction_api.")
         return None
     try:
-        response = requests.post(api_url_param, json=payload_dict, timeout=300) 
+        response = None
+        if isinstance(payload, ClientPayload) and API_PAYLOAD_FORMAT == 'arrow' and api_url_param not in _arrow_refused_urls:
+            response = post_arrow_payload(payload, api_url_param)
+        if response is None:
+            response = post_json_payload(payload, api_url_param)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.Timeout:
@@ -241,7 +784,8 @@ COMPARISON_COLS = {
 }
 
 # UPDATED to read from the efficient application_test.parquet file
-@st.cache_data
+# A resource rather than data: every session shares the one DataFrame (the charts only read it)
+@st.cache_resource
 def load_all_clients_data(app_file_name: str = "application_test.parquet"):
     """
     Loads descriptive data for all clients from the efficient application_test.parquet file.
@@ -253,9 +797,10 @@ def load_all_clients_data(app_file_name: str = "application_test.parquet"):
         cols_to_load.extend(['DAYS_BIRTH', 'DAYS_EMPLOYED', 'SK_ID_CURR', 'NAME_FAMILY_STATUS', 'CODE_GENDER'])
         cols_to_load = list(set(cols_to_load))
 
-        s3_path = f"s3://{S3_BUCKET_NAME}/data_parquet/{app_file_name}"
+        s3_path = f"{S3_DATA_FOLDER}/{app_file_name}"
         print(f"Loading all clients data for charts from: {s3_path}")
-        df_all = pd.read_parquet(s3_path, columns=cols_to_load)
+        table, _ = get_application_table(app_file_name)
+        df_all = table.select(cols_to_load).to_pandas()
 
         # --- Create simple features for comparison ---
         if 'DAYS_BIRTH' in df_all.columns:
@@ -0,0 +1,79 @@
+"""
+Background cache warm-up, started by the first script run of the process.
+
+The server answers its health check as soon as it is up, and the first page view only waits for the client ID
+list. Everything else the first clicks would pay cold is loaded afterwards in one low-priority background thread:
+the shared application table, the comparison dataset, then the data of the hot clients (WARMUP_CLIENT_IDS, or
+the first WARMUP_CLIENTS of the selectbox). The thread runs at a lower CPU priority, pauses between clients,
+and stops warming clients once the result cache reaches WARMUP_MEMORY_SHARE of its budget.
+Its progress is printed and kept in the dict returned by start_warmup, which the sidebar displays.
+"""
+
+import os
+import threading
+import time
+import traceback
+import streamlit as st
+
+from utils import get_application_table, load_available_client_ids, load_all_clients_data, get_data_for_client, get_client_result_cache
+
+# --- Configuration ---
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "1") == "1"
+WARMUP_CLIENT_IDS = [int(client_id) for client_id in os.environ.get("WARMUP_CLIENT_IDS", "").split(",") if client_id.strip()]
+WARMUP_CLIENTS = int(os.environ.get("WARMUP_CLIENTS", "20")) # hot clients when WARMUP_CLIENT_IDS is not set
+WARMUP_NICENESS = 10 # added to the warm-up thread's CPU niceness (Linux), so page views keep priority
+WARMUP_PAUSE_SECONDS = 0.2 # pause between two clients
+WARMUP_MEMORY_SHARE = 0.25 # share of the result cache budget the warm-up may fill
+
+
+def _lower_thread_priority():
+    """On Linux a thread has its own niceness: lower the current thread's priority only. No-op elsewhere."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), os.getpriority(os.PRIO_PROCESS, 0) + WARMUP_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def run_warmup(progress: dict):
+    """Loads the shared data and the hot clients in order, updating progress as it goes."""
+    _lower_thread_priority()
+    start = time.perf_counter()
+    progress['state'] = 'running'
+    try:
+        for step, load in [('application table', get_application_table), ('comparison data', load_all_clients_data)]:
+            progress['step'] = step
+            step_start = time.perf_counter()
+            load()
+            print(f"Warm-up: {step} loaded in {time.perf_counter() - step_start:.1f} s")
+
+        client_ids = WARMUP_CLIENT_IDS or load_available_client_ids()[:WARMUP_CLIENTS]
+        progress.update(step='clients', total=len(client_ids))
+        cache = get_client_result_cache()
+        for client_id in client_ids:
+            cache_stats = cache.stats()
+            if cache_stats['size_mb'] > WARMUP_MEMORY_SHARE * cache_stats['budget_mb']:
+                print(f"Warm-up: result cache at {cache_stats['size_mb']:.0f} MB, stopping after {progress['done']} clients.")
+                break
+            get_data_for_client(client_id)
+            progress['done'] += 1
+            time.sleep(WARMUP_PAUSE_SECONDS)
+        progress['state'] = 'done'
+    except Exception as e:
+        progress.update(state='failed', error=str(e))
+        print(f"Warm-up failed at step '{progress['step']}': {e}")
+        traceback.print_exc()
+    progress['seconds'] = time.perf_counter() - start
+    print(f"Warm-up {progress['state']}: {progress['done']}/{progress['total']} clients in {progress['seconds']:.1f} s")
+
+
+@st.cache_resource
+def start_warmup() -> dict:
+    """
+    Starts the warm-up thread once per process (the first script run calls it) and returns its progress:
+    {'state': 'disabled' | 'running' | 'done' | 'failed', 'step', 'done', 'total', 'seconds'}.
+    """
+    progress = {'state': 'disabled' if not WARMUP_ENABLED else 'pending', 'step': None, 'done': 0, 'total': 0, 'seconds': None}
+    if WARMUP_ENABLED:
+        # No script context on purpose: the warm-up never writes to the page of the session that started it
+        threading.Thread(target=run_warmup, args=(progress,), name='warmup', daemon=True).start()
+    return progress